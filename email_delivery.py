@@ -0,0 +1,162 @@
+import os
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# --- SMTP Configuration ---
+# Defaults target Gmail. Point SMTP_HOST/SMTP_PORT at a local sink (e.g. `python -m aiosmtpd -n -l localhost:8025`)
+# and set SMTP_STARTTLS=0 to exercise delivery without sending real mail.
+SMTP_HOST = os.getenv('SMTP_HOST', 'smtp.gmail.com')
+SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
+SMTP_USE_STARTTLS = os.getenv('SMTP_STARTTLS', '1') != '0'
+SMTP_TIMEOUT = 30
+
+# Number of authenticated connections kept open (and messages in flight) at once
+MAX_SMTP_CONNECTIONS = 3
+MAX_SEND_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 2
+
+# Errors after which the connection is considered dead and must be re-opened.
+# smtplib errors are OSError subclasses, so SMTP reply errors must be handled before these.
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, OSError)
+
+
+class SMTPConnectionPool:
+    """A small pool of authenticated SMTP connections that are reused across messages.
+
+    Connections are opened lazily (STARTTLS and login happen once per connection, not per message),
+    so a digest to a single recipient still costs exactly one handshake.
+    """
+
+    def __init__(self, username=None, password=None, host=SMTP_HOST, port=SMTP_PORT,
+                 starttls=SMTP_USE_STARTTLS, max_connections=MAX_SMTP_CONNECTIONS, timeout=SMTP_TIMEOUT):
+        self.username = username
+        self.password = password
+        self.host = host
+        self.port = port
+        self.starttls = starttls
+        self.max_connections = max(1, max_connections)
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        self._lock = threading.Lock()
+        self._open = []
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                server.starttls()
+            server.ehlo_or_helo_if_needed()
+            # Local sinks usually don't offer AUTH; only log in when the server supports it
+            if self.username and self.password and server.has_extn('auth'):
+                server.login(self.username, self.password)
+        except Exception:
+            server.close()
+            raise
+        with self._lock:
+            self._open.append(server)
+        return server
+
+    def _discard(self, server):
+        with self._lock:
+            if server in self._open:
+                self._open.remove(server)
+        try:
+            server.close()
+        except Exception:
+            pass
+
+    def _acquire(self):
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                return self._connect()
+            except Exception:
+                self._slots.release()
+                raise
+
+    def _release(self, server):
+        if server is not None:
+            self._idle.put(server)
+        self._slots.release()
+
+    def send(self, msg, max_attempts=MAX_SEND_ATTEMPTS):
+        """Send one message, retrying with backoff. Raises the last error if every attempt fails."""
+        last_error = None
+        for attempt in range(1, max_attempts + 1):
+            server = None
+            try:
+                server = self._acquire()
+                server.send_message(msg)
+                self._release(server)
+                return
+            except smtplib.SMTPRecipientsRefused as e:
+                # Every recipient was rejected; the connection is fine but retrying will not help
+                last_error = e
+                self._release(server)
+                break
+            except smtplib.SMTPResponseException as e:
+                last_error = e
+                if server is not None:
+                    self._release(server)
+                # 5xx replies are permanent (bad recipient, auth failure); retrying will not help
+                if 500 <= e.smtp_code < 600:
+                    break
+            except CONNECTION_ERRORS as e:
+                # Broken connection: drop it so the next attempt opens a fresh one
+                last_error = e
+                if server is not None:
+                    self._discard(server)
+                    self._slots.release()
+            except Exception as e:
+                last_error = e
+                if server is not None:
+                    self._release(server)
+            if attempt < max_attempts:
+                time.sleep(RETRY_BACKOFF_SECONDS * (2 ** (attempt - 1)))
+        raise last_error
+
+    def close(self):
+        with self._lock:
+            servers, self._open = self._open, []
+        for server in servers:
+            try:
+                server.quit()
+            except Exception:
+                try:
+                    server.close()
+                except Exception:
+                    pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def send_messages(messages, pool, max_workers=None):
+    """Send messages over a shared pool with bounded parallelism.
+
+    Returns a list of (msg, error) tuples in input order; error is None on success.
+    """
+    if not messages:
+        return []
+    max_workers = min(max_workers or pool.max_connections, pool.max_connections, len(messages))
+
+    def _send(msg):
+        try:
+            pool.send(msg)
+            return msg, None
+        except Exception as e:
+            return msg, e
+
+    if max_workers == 1:
+        return [_send(msg) for msg in messages]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_send, messages))
@@ -0,0 +1,100 @@
+import hashlib
+import os
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression, Ridge
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+# --- Fit Triage Model ---
+# Past LLM assessments are labels: a logistic regression on resume/job embedding features predicts whether
+# a job would be shortlisted, and a ridge regression predicts its fit_score. Jobs the model is confident
+# about are decided locally; only the ambiguous middle band is sent to the LLM. Labels accumulate in
+# TRIAGE_LABELS_FILE and the model is refit on all of them at the start of every triage pass.
+TRIAGE_LABELS_FILE = "triage_labels.npz"
+TRIAGE_MIN_LABELS = 100  # No triage until this many labels exist
+TRIAGE_MIN_CLASS_LABELS = 10  # ... with at least this many accepts and rejects each
+TRIAGE_ACCEPT_PROBABILITY = 0.9  # Auto-accept at or above this accept probability
+TRIAGE_REJECT_PROBABILITY = 0.1  # Auto-reject at or below this accept probability
+TRIAGE_AUDIT_FRACTION = 0.1  # Share of confident jobs still sent to the LLM to measure agreement
+
+# {label key: (features, fit_score, accepted)}
+triage_labels = {}
+
+def read_labels(labels_file):
+    """Labels stored in labels_file as {label key: (features, fit_score, accepted)}"""
+    labels = {}
+    with np.load(labels_file) as data:
+        for key, features, fit_score, accepted in zip(data['keys'].tolist(), data['features'].astype(np.float32),
+                                                      data['scores'].tolist(), data['accepted'].tolist()):
+            labels[key] = (features, fit_score, bool(accepted))
+    return labels
+
+def load_labels():
+    global triage_labels
+    triage_labels = {}
+    if os.path.exists(TRIAGE_LABELS_FILE):
+        try:
+            triage_labels = read_labels(TRIAGE_LABELS_FILE)
+            print(f"Loaded {len(triage_labels)} triage labels.")
+        except Exception as e:
+            print(f"Could not load triage labels: {e}")
+            triage_labels = {}
+
+def save_labels(labels_file=TRIAGE_LABELS_FILE, keys=None):
+    """Write the labels (or only those under keys, e.g. a shard's new ones) to labels_file"""
+    keys = list(triage_labels.keys()) if keys is None else list(keys)
+    if not keys:
+        return
+    try:
+        np.savez(labels_file, keys=np.array(keys),
+                 features=np.stack([triage_labels[k][0] for k in keys]),
+                 scores=np.array([triage_labels[k][1] for k in keys], dtype=np.float32),
+                 accepted=np.array([triage_labels[k][2] for k in keys], dtype=bool))
+    except Exception as e:
+        print(f"Could not save triage labels: {e}")
+
+def add_label(key, features, fit_score, accepted):
+    triage_labels[key] = (np.asarray(features, dtype=np.float32), float(fit_score), bool(accepted))
+
+def triage_features(resume_embedding, job_embeddings):
+    """Features for each job: elementwise product of the normalized resume and job embeddings, plus their cosine.
+
+    The product keeps which dimensions agree, so one model serves every resume (profiles mode).
+    """
+    resume_vector = np.asarray(resume_embedding, dtype=np.float32)
+    resume_vector = resume_vector / (np.linalg.norm(resume_vector) or 1.0)
+    job_matrix = np.atleast_2d(np.asarray(job_embeddings, dtype=np.float32))
+    job_matrix = job_matrix / np.maximum(np.linalg.norm(job_matrix, axis=1, keepdims=True), 1e-12)
+    products = job_matrix * resume_vector
+    return np.hstack([products, products.sum(axis=1, keepdims=True)])
+
+def train_triage_model(feature_dim):
+    """Fit the accept classifier and score regressor on all labels. Returns None until there are enough labels."""
+    labels = [label for label in triage_labels.values() if label[0].shape[0] == feature_dim]
+    accepted = np.array([label[2] for label in labels], dtype=bool)
+    if len(labels) < TRIAGE_MIN_LABELS or min(accepted.sum(), (~accepted).sum()) < TRIAGE_MIN_CLASS_LABELS:
+        print(f"Triage model inactive: {len(labels)} labels ({int(accepted.sum())} accepted), "
+              f"needs {TRIAGE_MIN_LABELS} with {TRIAGE_MIN_CLASS_LABELS} of each outcome.")
+        return None
+
+    features = np.stack([label[0] for label in labels])
+    # Embedding products are tiny; standardize so regularization treats every dimension alike
+    classifier = make_pipeline(StandardScaler(), LogisticRegression(C=0.1, class_weight='balanced', max_iter=1000))
+    classifier.fit(features, accepted)
+    regressor = make_pipeline(StandardScaler(), Ridge(alpha=10.0))
+    regressor.fit(features, np.array([label[1] for label in labels], dtype=np.float32))
+    print(f"Triage model trained on {len(labels)} labels ({int(accepted.sum())} accepted).")
+    return classifier, regressor
+
+def predict(model, features):
+    """Returns (accept probabilities, predicted fit scores)"""
+    classifier, regressor = model
+    return classifier.predict_proba(features)[:, 1], np.clip(regressor.predict(features), 0, 10)
+
+def is_confident(probability):
+    return probability >= TRIAGE_ACCEPT_PROBABILITY or probability <= TRIAGE_REJECT_PROBABILITY
+
+def is_audit_sample(key):
+    """Stable pseudo-random choice of confident jobs that are still checked by the LLM"""
+    return int(hashlib.sha1(key.encode('utf-8')).hexdigest()[:8], 16) / 0xFFFFFFFF < TRIAGE_AUDIT_FRACTION
@@ -3,10 +3,20 @@ import PyPDF2
 import google.generativeai as genai
 import os
 import json
+import re
+import hashlib
+import heapq
+import csv
+import argparse
+import struct
+import zipfile
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 import time
 
+from job_dedup import cluster_texts
+import fit_triage
+
 # --- Configuration ---
 CSV_FILE_NAME = "google_jobs_with_details.csv"
 PDF_RESUME_FILE_NAME = "resume.pdf"  # Make sure to add your resume file
@@ -18,15 +28,30 @@ EMBEDDING_SIMILARITY_THRESHOLD = 0.55
 MAX_JOBS_AFTER_EMBEDDING_FILTER = 200
 MAX_JOBS_TO_ANALYZE_WITH_LLM = float('inf')
 
+# Shortlisting criteria
+DESIRED_FIT_SCORE_THRESHOLD = 7
+DESIRED_CATEGORIES = ["Strong Fit", "Potential Fit"]
+
+# Embed and assess each cluster of (near-)duplicate postings once, then copy the result to every member
+DEDUPLICATE_JOBS = True
+
+# Let the local triage model (fit_triage.py) decide clear accepts/rejects and send only ambiguous jobs to the LLM.
+# It stays inactive until enough LLM assessments have been collected as labels.
+TRIAGE_JOBS = True
+TRIAGE_ACCEPT_CATEGORY = "Potential Fit"
+TRIAGE_REJECT_CATEGORY = "Not a Good Fit"
+
 OUTPUT_CSV_NAME = "analyzed_google_jobs_full.csv"
 SHORTLISTED_CSV_NAME = "shortlisted_google_jobs_full.csv"
 
 # --- 1. Load API Key and Configure Google Generative AI ---
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
 
-if not GOOGLE_API_KEY:
-    print("Error: GOOGLE_API_KEY environment variable not found.")
-    exit()
+def require_api_key():
+    """Exit unless GOOGLE_API_KEY is set. Called by every entry point that talks to the API."""
+    if not GOOGLE_API_KEY:
+        print("Error: GOOGLE_API_KEY environment variable not found.")
+        exit()
 
 genai.configure(api_key=GOOGLE_API_KEY)
 
@@ -36,9 +61,16 @@ embedding_model_name = "models/text-embedding-004"
 # --- Caching ---
 llm_response_cache = {}
 CACHE_FILE = "llm_response_cache.json"
+# Shard runs write cache deltas instead, so workers sharing a directory never overwrite each other
+cache_writes_enabled = True
+
+# Negative cache: jobs whose assessment kept failing are not retried until NEGATIVE_CACHE_TTL_HOURS pass
+llm_failure_cache = {}
+FAILURE_CACHE_FILE = "llm_failure_cache.json"
+NEGATIVE_CACHE_TTL_HOURS = 72
 
 def load_cache():
-    global llm_response_cache
+    global llm_response_cache, llm_failure_cache
     if os.path.exists(CACHE_FILE):
         try:
             with open(CACHE_FILE, 'r') as f:
@@ -50,12 +82,168 @@ def load_cache():
     else:
         llm_response_cache = {}
 
+    llm_failure_cache = {}
+    if os.path.exists(FAILURE_CACHE_FILE):
+        try:
+            with open(FAILURE_CACHE_FILE, 'r') as f:
+                failures = json.load(f)
+            cutoff = time.time() - NEGATIVE_CACHE_TTL_HOURS * 3600
+            llm_failure_cache = {key: failure for key, failure in failures.items() if failure.get('failed_at', 0) >= cutoff}
+            if llm_failure_cache:
+                print(f"Loaded {len(llm_failure_cache)} negative-cached failures.")
+        except Exception as e:
+            print(f"Could not load failure cache: {e}")
+
+    fit_triage.load_labels()
+
 def save_cache():
+    if not cache_writes_enabled:
+        return
     try:
         with open(CACHE_FILE, 'w') as f:
             json.dump(llm_response_cache, f, indent=2)
     except Exception as e:
         print(f"Could not save cache: {e}")
+    try:
+        with open(FAILURE_CACHE_FILE, 'w') as f:
+            json.dump(llm_failure_cache, f, indent=2)
+    except Exception as e:
+        print(f"Could not save failure cache: {e}")
+
+# Job embeddings keyed by a hash of the embedded text, so unchanged postings are not re-embedded
+# across runs or across profiles within a run.
+job_embedding_cache = {}
+EMBEDDING_CACHE_FILE = "job_embedding_cache.npz"
+
+# Streaming mode does not load the cache: it memory-maps it and appends new embeddings to EMBEDDING_DELTA_FILE
+# (fixed-size key + vector records). The next load_embedding_cache() folds the delta in and the next save removes it.
+EMBEDDING_DELTA_FILE = "job_embedding_cache_delta.bin"
+EMBEDDING_KEY_BYTES = 40  # sha1 hex digest
+
+def load_embedding_cache():
+    global job_embedding_cache
+    job_embedding_cache = {}
+    if os.path.exists(EMBEDDING_CACHE_FILE):
+        try:
+            with np.load(EMBEDDING_CACHE_FILE) as data:
+                job_embedding_cache = dict(zip(data['keys'].tolist(), data['embeddings'].astype(np.float32)))
+            print(f"Loaded {len(job_embedding_cache)} job embeddings from cache.")
+        except Exception as e:
+            print(f"Could not load embedding cache: {e}")
+            job_embedding_cache = {}
+
+    delta = read_embedding_delta()
+    if delta is not None:
+        job_embedding_cache.update((key.decode('ascii'), np.array(embedding)) for key, embedding in zip(delta['key'], delta['embedding']))
+        print(f"Added {len(delta)} job embeddings from {EMBEDDING_DELTA_FILE}.")
+
+def save_embedding_cache():
+    if not job_embedding_cache or not cache_writes_enabled:
+        return
+    try:
+        keys = list(job_embedding_cache.keys())
+        np.savez(EMBEDDING_CACHE_FILE, keys=np.array(keys), embeddings=np.stack([job_embedding_cache[k] for k in keys]))
+    except Exception as e:
+        print(f"Could not save embedding cache: {e}")
+        return
+    # The delta was folded in by load_embedding_cache
+    if os.path.exists(EMBEDDING_DELTA_FILE):
+        os.remove(EMBEDDING_DELTA_FILE)
+
+def _delta_record_dtype(dim):
+    return np.dtype([('key', f'S{EMBEDDING_KEY_BYTES}'), ('embedding', '<f4', (dim,))])
+
+def _delta_dim():
+    if not os.path.exists(EMBEDDING_DELTA_FILE) or os.path.getsize(EMBEDDING_DELTA_FILE) < 4:
+        return None
+    return int(np.fromfile(EMBEDDING_DELTA_FILE, dtype='<u4', count=1)[0])
+
+def read_embedding_delta():
+    """Memory-map the delta file as (key, embedding) records. Returns None when it is missing or empty."""
+    dim = _delta_dim()
+    if not dim:
+        return None
+    record_dtype = _delta_record_dtype(dim)
+    count = (os.path.getsize(EMBEDDING_DELTA_FILE) - 4) // record_dtype.itemsize
+    if not count:
+        return None
+    return np.memmap(EMBEDDING_DELTA_FILE, dtype=record_dtype, mode='r', offset=4, shape=(count,))
+
+def append_embedding_delta(cache_key, embedding):
+    """Append one embedding to the delta file. Returns False if its dimension does not match the file."""
+    dim = _delta_dim()
+    if dim is not None and dim != len(embedding):
+        return False
+    with open(EMBEDDING_DELTA_FILE, 'ab') as f:
+        if dim is None:
+            f.truncate(0)
+            f.write(np.array([len(embedding)], dtype='<u4').tobytes())
+        f.write(np.array([(cache_key.encode('ascii'), embedding)], dtype=_delta_record_dtype(len(embedding))).tobytes())
+    return True
+
+def memmap_npz_member(npz_path, member):
+    """Memory-map an array stored in an .npz. np.savez stores members uncompressed, so the .npy data
+    sits at a fixed offset in the file. Returns None for compressed archives."""
+    with zipfile.ZipFile(npz_path) as archive:
+        info = archive.getinfo(f"{member}.npy")
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+    with open(npz_path, 'rb') as f:
+        f.seek(info.header_offset)
+        name_length, extra_length = struct.unpack('<HH', f.read(30)[26:30])
+        f.seek(info.header_offset + 30 + name_length + extra_length)
+        version = np.lib.format.read_magic(f)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        shape, fortran_order, dtype = read_header(f)
+        offset = f.tell()
+    if fortran_order or dtype.hasobject:
+        return None
+    return np.memmap(npz_path, dtype=dtype, mode='r', offset=offset, shape=shape)
+
+# Streaming lookups: {cache key: (source, row)} over the memory-mapped cache file and delta
+streaming_embeddings = {'index': {}, 'main': None, 'delta': None, 'delta_rows': 0}
+
+def open_streaming_embedding_cache():
+    """Index the persisted embeddings for streaming mode without loading the vectors"""
+    index = {}
+    main = None
+    if os.path.exists(EMBEDDING_CACHE_FILE):
+        try:
+            main = memmap_npz_member(EMBEDDING_CACHE_FILE, 'embeddings')
+            if main is not None:
+                with np.load(EMBEDDING_CACHE_FILE) as data:
+                    index = {key: ('main', row) for row, key in enumerate(data['keys'].tolist())}
+            else:
+                print("Embedding cache is compressed and cannot be memory-mapped; new lookups go to the API.")
+        except Exception as e:
+            print(f"Could not open embedding cache: {e}")
+            main, index = None, {}
+    delta = read_embedding_delta()
+    if delta is not None:
+        index.update((key.decode('ascii'), ('delta', row)) for row, key in enumerate(delta['key']))
+    streaming_embeddings.update(index=index, main=main, delta=delta, delta_rows=0 if delta is None else len(delta))
+    print(f"Indexed {len(index)} cached job embeddings (memory-mapped).")
+
+def get_streaming_job_embedding(job_desc_text_for_embedding, job_title_for_embed):
+    """get_job_embedding for streaming mode: reads the memory-mapped cache and appends misses to the delta file"""
+    cache_key = hashlib.sha1(f"{job_title_for_embed}\n{job_desc_text_for_embedding}".encode('utf-8')).hexdigest()
+    location = streaming_embeddings['index'].get(cache_key)
+    if location:
+        source, row = location
+        if source == 'delta' and (streaming_embeddings['delta'] is None or row >= len(streaming_embeddings['delta'])):
+            # Appended earlier in this run; remap to see the new records
+            streaming_embeddings['delta'] = read_embedding_delta()
+        records = streaming_embeddings[source]
+        return np.array(records[row] if source == 'main' else records['embedding'][row], dtype=np.float32)
+
+    embedding = get_text_embedding(job_desc_text_for_embedding, title=job_title_for_embed)
+    if not embedding:
+        return None
+    embedding = np.asarray(embedding, dtype=np.float32)
+    if cache_writes_enabled and append_embedding_delta(cache_key, embedding):
+        streaming_embeddings['index'][cache_key] = ('delta', streaming_embeddings['delta_rows'])
+        streaming_embeddings['delta_rows'] += 1
+    return embedding
 
 # --- Helper Functions ---
 def extract_text_from_pdf(pdf_path):
@@ -105,15 +293,165 @@ def get_text_embedding(text_input, task_type="RETRIEVAL_DOCUMENT", title=None):
             print(f"Retry failed: {retry_e}")
             return None
 
-def get_llm_assessment_json(resume_content, job_details_text, job_title_for_llm, job_url_for_llm):
-    cache_key = job_url_for_llm
+DEFAULT_CANDIDATE_NOTES = "The user has 2 years of experience. And is NOT focusing on core SDE roles."
+
+# --- LLM Output Schema and Retries ---
+FIT_CATEGORIES = ["Strong Fit", "Potential Fit", "Borderline Fit", "Not a Good Fit"]
+ASSESSMENT_LIST_FIELDS = ["key_matches", "potential_gaps"]
+ASSESSMENT_TEXT_FIELDS = ["job_title", "job_url", "reasoning_summary", "auto_drafted_outreach_snippet"]
+# Passed as response_schema so the model is constrained to this shape
+ASSESSMENT_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "job_title": {"type": "STRING"},
+        "job_url": {"type": "STRING"},
+        # The pinned SDK's Schema has no minimum/maximum, so the 0-10 range is stated in the description
+        "fit_score": {"type": "INTEGER", "description": "Fit score from 0 to 10"},
+        "fit_category": {"type": "STRING", "format": "enum", "enum": FIT_CATEGORIES},
+        "key_matches": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "potential_gaps": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "reasoning_summary": {"type": "STRING"},
+        "auto_drafted_outreach_snippet": {"type": "STRING"},
+    },
+    "required": ["job_title", "job_url", "fit_score", "fit_category", "key_matches", "potential_gaps",
+                 "reasoning_summary", "auto_drafted_outreach_snippet"],
+}
+ASSESSMENT_GENERATION_CONFIG = {"response_mime_type": "application/json", "response_schema": ASSESSMENT_SCHEMA}
+
+LLM_MAX_ATTEMPTS = 3
+LLM_RETRY_BACKOFF_SECONDS = 5
+
+# --- LLM Budget ---
+# Jobs are assessed best-first (highest embedding similarity), so stopping at any point leaves the best
+# possible shortlist for the time and quota spent. Unset (0) means no limit. The deadline is measured
+# from process start, so it can be set a little under the runner's time limit.
+RUN_START_TIME = time.time()
+LLM_DEADLINE_SECONDS = float(os.getenv('LLM_DEADLINE_SECONDS', '0')) or None
+LLM_MAX_CALLS = int(os.getenv('LLM_MAX_CALLS', '0')) or None
+LLM_MAX_TOKENS = int(os.getenv('LLM_MAX_TOKENS', '0')) or None
+llm_usage = {'calls': 0, 'tokens': 0, 'seconds': 0.0}
+
+def llm_budget_exhausted():
+    """Return why the next paid LLM call would not fit the budget, or None if it does"""
+    calls = llm_usage['calls']
+    if LLM_MAX_CALLS is not None and calls >= LLM_MAX_CALLS:
+        return f"call budget of {LLM_MAX_CALLS} reached"
+    if LLM_MAX_TOKENS is not None and calls and llm_usage['tokens'] + llm_usage['tokens'] / calls > LLM_MAX_TOKENS:
+        return f"token budget of {LLM_MAX_TOKENS} reached ({llm_usage['tokens']} used)"
+    if LLM_DEADLINE_SECONDS is not None:
+        expected_call_seconds = llm_usage['seconds'] / calls if calls else 0
+        if time.time() + expected_call_seconds > RUN_START_TIME + LLM_DEADLINE_SECONDS:
+            return f"deadline of {LLM_DEADLINE_SECONDS:.0f}s reached"
+    return None
+
+# With a call or token budget set, the fixed job caps are lifted and the ranked queue is worked through until
+# the budget runs out, so unused budget buys a deeper shortlist. A deadline alone bounds wall clock, not spend,
+# so it keeps the caps. Streaming mode still keeps a bounded candidate heap.
+STREAMING_BUDGET_MAX_JOBS = 5000
+
+def llm_spend_budget_configured():
+    return LLM_MAX_CALLS is not None or LLM_MAX_TOKENS is not None
+
+def prefilter_job_cap(streaming=False):
+    """Jobs kept after embedding pre-filtering: MAX_JOBS_AFTER_EMBEDDING_FILTER, or the spend budget's queue"""
+    if not llm_spend_budget_configured():
+        return MAX_JOBS_AFTER_EMBEDDING_FILTER
+    return max(MAX_JOBS_AFTER_EMBEDDING_FILTER, STREAMING_BUDGET_MAX_JOBS) if streaming else float('inf')
+
+def llm_job_cap():
+    """Jobs sent to assessment: MAX_JOBS_TO_ANALYZE_WITH_LLM, or no cap when the spend budget decides"""
+    return float('inf') if llm_spend_budget_configured() else MAX_JOBS_TO_ANALYZE_WITH_LLM
+
+def record_llm_usage(response, call_seconds):
+    llm_usage['calls'] += 1
+    llm_usage['seconds'] += call_seconds
+    try:
+        llm_usage['tokens'] += response.usage_metadata.total_token_count
+    except AttributeError:
+        pass
+
+def llm_cache_key(job_url, cache_scope=None):
+    # cache_scope separates assessments of the same job for different resumes (profiles mode)
+    return f"{cache_scope}::{job_url}" if cache_scope else job_url
+
+def parse_assessment_text(response_text):
+    """Parse the model's JSON, tolerating code fences and text around the object"""
+    cleaned_response_text = response_text.strip()
+    if cleaned_response_text.startswith("```"):
+        cleaned_response_text = cleaned_response_text.split("\n", 1)[-1]
+    if cleaned_response_text.endswith("```"):
+        cleaned_response_text = cleaned_response_text[:-3]
+    try:
+        return json.loads(cleaned_response_text)
+    except json.JSONDecodeError:
+        start, end = cleaned_response_text.find('{'), cleaned_response_text.rfind('}')
+        if start == -1 or end <= start:
+            raise
+        return json.loads(cleaned_response_text[start:end + 1])
+
+def repair_assessment_fields(assessment, job_title_for_llm, job_url_for_llm):
+    """Fix malformed fields in place without another model call. Raises ValueError if fit_score is unusable."""
+    if not isinstance(assessment, dict):
+        raise ValueError(f"expected a JSON object, got {type(assessment).__name__}")
+
+    fit_score = assessment.get('fit_score')
+    if not isinstance(fit_score, int) or isinstance(fit_score, bool):
+        # e.g. "8", "8/10", 7.5
+        match = re.search(r'\d+(\.\d+)?', str(fit_score))
+        if not match:
+            raise ValueError(f"fit_score is not a number: {fit_score!r}")
+        fit_score = int(round(float(match.group(0))))
+    assessment['fit_score'] = max(0, min(10, fit_score))
+
+    category = str(assessment.get('fit_category', '')).strip()
+    matched_category = next((c for c in FIT_CATEGORIES if c.lower() == category.lower()), None)
+    if matched_category is None:
+        # Derive the category from the score
+        score = assessment['fit_score']
+        matched_category = "Strong Fit" if score >= 8 else "Potential Fit" if score >= 7 else "Borderline Fit" if score >= 5 else "Not a Good Fit"
+    assessment['fit_category'] = matched_category
+
+    for field in ASSESSMENT_LIST_FIELDS:
+        value = assessment.get(field)
+        if isinstance(value, str):
+            assessment[field] = [item.strip() for item in value.split(',') if item.strip()]
+        elif not isinstance(value, list):
+            assessment[field] = []
+
+    for field in ASSESSMENT_TEXT_FIELDS:
+        if not isinstance(assessment.get(field), str):
+            assessment[field] = "" if assessment.get(field) is None else str(assessment[field])
+    assessment['job_title'] = assessment['job_title'] or job_title_for_llm
+    # The URL is the join key back to the job; never trust an echoed value that differs
+    assessment['job_url'] = job_url_for_llm
+    return assessment
+
+def is_retryable_assessment(assessment_json):
+    return 'error' in assessment_json and assessment_json.get('error_type') in ('api', 'parse')
+
+def record_llm_failure(cache_key, assessment_json, attempts):
+    """Negative-cache a job whose assessment failed LLM_MAX_ATTEMPTS times"""
+    llm_failure_cache[cache_key] = {
+        'error': assessment_json.get('error', '')[:500],
+        'error_type': assessment_json.get('error_type'),
+        'attempts': attempts,
+        'failed_at': time.time(),
+    }
+
+def get_llm_assessment_json(resume_content, job_details_text, job_title_for_llm, job_url_for_llm,
+                            cache_scope=None, candidate_notes=DEFAULT_CANDIDATE_NOTES):
+    cache_key = llm_cache_key(job_url_for_llm, cache_scope)
     if cache_key in llm_response_cache:
         return llm_response_cache[cache_key]
+    if cache_key in llm_failure_cache:
+        failure = llm_failure_cache[cache_key]
+        error_detail = f"Skipped: assessment failed {failure.get('attempts')} times recently (negative-cached). Last error: {failure.get('error', '')[:200]}"
+        return {"error": error_detail, "error_type": "negative_cached", "job_title": job_title_for_llm, "job_url": job_url_for_llm}
 
     prompt = f"""
     You are a highly skilled career advisor and resume analyst.
     Your task is to evaluate the provided resume against a specific job description and return your analysis strictly in JSON format.
-    Also please make sure that The user has 2 years of experience. And is NOT focusing on core SDE roles. 
+    Also please make sure that {candidate_notes} 
 
     **Resume Content:**
     ---
@@ -140,164 +478,315 @@ def get_llm_assessment_json(resume_content, job_details_text, job_title_for_llm,
 
     Ensure the output is ONLY a valid JSON object. Do not include any text before or after the JSON.
     """
+    budget_reason = llm_budget_exhausted()
+    if budget_reason:
+        return {"error": f"Skipped: {budget_reason}", "error_type": "budget", "job_title": job_title_for_llm, "job_url": job_url_for_llm}
+
+    call_start_time = time.time()
+    response = None
     try:
-        response = analysis_model.generate_content(prompt)
-        try:
-            cleaned_response_text = response.text.strip()
-            if cleaned_response_text.startswith("```json"):
-                cleaned_response_text = cleaned_response_text[7:]
-            if cleaned_response_text.endswith("```"):
-                cleaned_response_text = cleaned_response_text[:-3]
-
-            llm_output_json = json.loads(cleaned_response_text.strip())
-            llm_response_cache[cache_key] = llm_output_json
-            return llm_output_json
-        except json.JSONDecodeError as je:
-            error_detail = f"LLM response not valid JSON. JSONDecodeError: {je}. Response: {response.text[:500]}..."
-            return {"error": error_detail, "job_title": job_title_for_llm, "job_url": job_url_for_llm}
-        except AttributeError:
-             error_detail = "Invalid LLM response object (no 'text' attribute)."
-             return {"error": error_detail, "job_title": job_title_for_llm, "job_url": job_url_for_llm}
+        response = analysis_model.generate_content(prompt, generation_config=ASSESSMENT_GENERATION_CONFIG)
+        record_llm_usage(response, time.time() - call_start_time)
+        response_text = response.text
     except Exception as e:
+        # Also covers responses without text (e.g. blocked by safety filters)
+        if response is None:
+            record_llm_usage(None, time.time() - call_start_time)
         error_detail = f"LLM API call failed: {e}"
-        return {"error": error_detail, "job_title": job_title_for_llm, "job_url": job_url_for_llm}
+        return {"error": error_detail, "error_type": "api", "job_title": job_title_for_llm, "job_url": job_url_for_llm}
 
-def main():
-    """Main function"""
-    # Set configuration as local variables to avoid scoping issues
-    USE_EMBEDDING_PRE_FILTERING = DEFAULT_USE_EMBEDDING_PRE_FILTERING
-    
-    start_time = time.time()
-    print("--- Starting Full Job Fit Analysis ---")
-    load_cache()
+    try:
+        llm_output_json = repair_assessment_fields(parse_assessment_text(response_text), job_title_for_llm, job_url_for_llm)
+    except (json.JSONDecodeError, ValueError) as e:
+        error_detail = f"LLM response not valid JSON: {e}. Response: {response_text[:500]}..."
+        return {"error": error_detail, "error_type": "parse", "job_title": job_title_for_llm, "job_url": job_url_for_llm}
 
-    # 1. Extract Resume Content
-    print(f"\nExtracting text from resume: {PDF_RESUME_FILE_NAME}...")
-    if not os.path.exists(PDF_RESUME_FILE_NAME):
-        print(f"Error: Resume file '{PDF_RESUME_FILE_NAME}' not found. Please add your resume file.")
-        return
-        
-    resume_text = extract_text_from_pdf(PDF_RESUME_FILE_NAME)
+    llm_response_cache[cache_key] = llm_output_json
+    llm_failure_cache.pop(cache_key, None)
+    return llm_output_json
+
+def get_llm_assessment_with_retries(resume_content, job_details_text, job_title_for_llm, job_url_for_llm,
+                                    cache_scope=None, candidate_notes=DEFAULT_CANDIDATE_NOTES):
+    """Inline variant of the retry queue for callers that handle one job at a time (streaming mode)"""
+    for attempt in range(1, LLM_MAX_ATTEMPTS + 1):
+        assessment_json = get_llm_assessment_json(resume_content, job_details_text, job_title_for_llm, job_url_for_llm,
+                                                  cache_scope=cache_scope, candidate_notes=candidate_notes)
+        if not is_retryable_assessment(assessment_json):
+            return assessment_json
+        if attempt < LLM_MAX_ATTEMPTS:
+            time.sleep(LLM_RETRY_BACKOFF_SECONDS * (2 ** (attempt - 1)))
+    record_llm_failure(llm_cache_key(job_url_for_llm, cache_scope), assessment_json, LLM_MAX_ATTEMPTS)
+    return assessment_json
+
+# --- Job Record Helpers ---
+PREF_QUAL_COLS = [f'pref_qual_{i}' for i in range(1, 7)]
+RESPONSIBILITY_COLS = [f'responsibility_{i}' for i in range(1, 6)]
+TITLE_COL = 'title'
+URL_COL = 'url'
+
+def get_job_list_field(row, list_field, flat_cols):
+    """Return a list-valued job field.
+
+    Rows handed over in memory by the scraper keep native lists (e.g. 'preferred_qualifications'),
+    rows loaded from CSV have them exploded into numbered columns (e.g. 'pref_qual_1').
+    """
+    value = row.get(list_field)
+    if isinstance(value, (list, tuple, np.ndarray)):
+        items = [str(item).strip() for item in value[:len(flat_cols)]]
+        return [item for item in items if item]
+    return [str(row.get(col, "")).strip() for col in flat_cols if pd.notna(row.get(col)) and str(row.get(col)).strip()]
+
+def get_job_pref_quals(row):
+    return get_job_list_field(row, 'preferred_qualifications', PREF_QUAL_COLS)
+
+def get_job_responsibilities(row):
+    return get_job_list_field(row, 'responsibilities', RESPONSIBILITY_COLS)
+
+# Native list fields of in-memory job records and the numbered CSV columns job_scraper.save_to_csv writes instead
+JOB_LIST_FIELD_COLUMN_PREFIXES = {'minimum_qualifications': 'min_qual', 'preferred_qualifications': 'pref_qual',
+                                  'responsibilities': 'responsibility'}
+
+def flatten_job_list_fields(df):
+    """Explode native list fields into numbered columns and drop full_description, as the scraper's CSV does.
+
+    Keeps the CSVs of an in-memory run (run_pipeline.py) in the same layout as those of the three-script path.
+    """
+    df = df.drop(columns=['full_description'], errors='ignore')
+    for list_field, column_prefix in JOB_LIST_FIELD_COLUMN_PREFIXES.items():
+        if list_field not in df.columns:
+            continue
+        exploded_columns = {}
+        for index, value in df.pop(list_field).items():
+            if isinstance(value, (list, tuple, np.ndarray)):
+                for i, item in enumerate(value, 1):
+                    exploded_columns.setdefault(f"{column_prefix}_{i}", {})[index] = item
+        for column, values in exploded_columns.items():
+            df[column] = pd.Series(values, dtype=object)
+    return df
+
+def add_job_ids(df_jobs):
+    """Add the job_id_unique column used to match assessments back to their jobs"""
+    if 'job_id_unique' not in df_jobs.columns:
+        df_jobs['job_id_unique'] = df_jobs.index.astype(str) + "_" + df_jobs.get('url', pd.Series([''] * len(df_jobs))).fillna('').str.split('=').str[-1]
+    return df_jobs
+
+def load_jobs_csv(csv_file_name=CSV_FILE_NAME):
+    """Load scraped jobs from CSV. Returns None if the file does not exist."""
+    try:
+        print(f"\nLoading job data from: {csv_file_name}...")
+        df_jobs = add_job_ids(pd.read_csv(csv_file_name))
+    except FileNotFoundError:
+        print(f"Error: CSV file '{csv_file_name}' not found. Please run the job scraper first.")
+        return None
+    print(f"Job data loaded successfully. Total jobs in CSV: {len(df_jobs)}")
+    return df_jobs
+
+def load_resume_text(pdf_path=PDF_RESUME_FILE_NAME):
+    """Extract resume text, printing progress. Returns None on failure."""
+    print(f"\nExtracting text from resume: {pdf_path}...")
+    if not os.path.exists(pdf_path):
+        print(f"Error: Resume file '{pdf_path}' not found. Please add your resume file.")
+        return None
+
+    resume_text = extract_text_from_pdf(pdf_path)
     if not resume_text:
         print("Could not extract resume text. Exiting.")
-        return
+        return None
     print("Resume text extracted successfully.")
-    
-    resume_embedding = None
-    if USE_EMBEDDING_PRE_FILTERING:
-        print("Generating resume embedding...")
-        resume_embedding = get_text_embedding(resume_text, task_type="RETRIEVAL_QUERY", title="Candidate Resume")
-        if not resume_embedding:
-            print("Could not generate resume embedding. Disabling embedding pre-filtering.")
-            USE_EMBEDDING_PRE_FILTERING = False
-        else:
-            print("Resume embedding generated.")
+    return resume_text
 
-    # 2. Load Job Data
-    try:
-        print(f"\nLoading job data from: {CSV_FILE_NAME}...")
-        df_jobs_initial = pd.read_csv(CSV_FILE_NAME)
-        if 'job_id_unique' not in df_jobs_initial.columns:
-            df_jobs_initial['job_id_unique'] = df_jobs_initial.index.astype(str) + "_" + df_jobs_initial.get('url', pd.Series([''] * len(df_jobs_initial))).fillna('').str.split('=').str[-1]
+def build_embedding_text(row):
+    pref_quals_list = get_job_pref_quals(row)
+    resp_list = get_job_responsibilities(row)
+    return f"Preferred Qualifications: {' '.join(pref_quals_list)}\nResponsibilities: {' '.join(resp_list)}"
 
-    except FileNotFoundError:
-        print(f"Error: CSV file '{CSV_FILE_NAME}' not found. Please run the job scraper first.")
-        return
-    print(f"Job data loaded successfully. Total jobs in CSV: {len(df_jobs_initial)}")
+def get_job_embedding(job_desc_text_for_embedding, job_title_for_embed):
+    """Embed a job description, reusing the job embedding cache. Returns a float32 array or None."""
+    cache_key = hashlib.sha1(f"{job_title_for_embed}\n{job_desc_text_for_embedding}".encode('utf-8')).hexdigest()
+    if cache_key in job_embedding_cache:
+        return job_embedding_cache[cache_key]
+    embedding = get_text_embedding(job_desc_text_for_embedding, title=job_title_for_embed)
+    if not embedding:
+        return None
+    embedding = np.asarray(embedding, dtype=np.float32)
+    job_embedding_cache[cache_key] = embedding
+    return embedding
 
-    # Define columns
-    pref_qual_cols = [f'pref_qual_{i}' for i in range(1, 7)]
-    responsibility_cols = [f'responsibility_{i}' for i in range(1, 6)]
-    title_col = 'title'
-    url_col = 'url'
+def embed_jobs(df_jobs):
+    """Embed every job once. Returns (original_indices, embeddings_matrix) for the jobs that could be embedded."""
+    original_indices = []
+    embeddings = []
+    print(f"Generating embeddings for {len(df_jobs)} jobs (this may take a while)...")
+    for i, (index, row) in enumerate(df_jobs.iterrows()):
+        job_title_for_embed = str(row.get(TITLE_COL, "")).strip()
+        job_desc_text_for_embedding = build_embedding_text(row)
 
-    jobs_to_process_further_df = df_jobs_initial
+        if job_desc_text_for_embedding.strip():
+            embedding = get_job_embedding(job_desc_text_for_embedding, job_title_for_embed)
+            if embedding is not None:
+                original_indices.append(index)
+                embeddings.append(embedding)
 
-    # 3. Embedding-Based Pre-filtering (if enabled)
-    if USE_EMBEDDING_PRE_FILTERING and resume_embedding is not None:
-        print("\n--- Starting Embedding Pre-filtering ---")
-        job_embeddings_data = []
-        print(f"Generating embeddings for {len(df_jobs_initial)} jobs (this may take a while)...")
-        for i, (index, row) in enumerate(df_jobs_initial.iterrows()):
-            job_title_for_embed = str(row.get(title_col, "")).strip()
-            job_url_for_embed = str(row.get(url_col, f"job_index_{index}")).strip()
+        if (i + 1) % 50 == 0:
+            print(f"  Generated embeddings for {i + 1}/{len(df_jobs)} jobs...")
+    print("Finished generating job embeddings.")
+    save_embedding_cache()
 
-            pref_quals_list = [str(row.get(col, "")).strip() for col in pref_qual_cols if pd.notna(row.get(col)) and str(row.get(col)).strip()]
-            resp_list = [str(row.get(col, "")).strip() for col in responsibility_cols if pd.notna(row.get(col)) and str(row.get(col)).strip()]
+    if not embeddings:
+        return [], None
+    return original_indices, np.stack(embeddings)
 
-            job_desc_text_for_embedding = f"Preferred Qualifications: {' '.join(pref_quals_list)}\nResponsibilities: {' '.join(resp_list)}"
+def select_jobs_by_similarity(df_jobs_initial, original_indices, similarities, max_jobs=None):
+    """Keep jobs above EMBEDDING_SIMILARITY_THRESHOLD, best first, capped at max_jobs (default prefilter_job_cap())"""
+    max_jobs = prefilter_job_cap() if max_jobs is None else max_jobs
+    highly_similar_jobs_with_data = [
+        {'original_index': index, 'similarity': similarity}
+        for index, similarity in zip(original_indices, similarities)
+        if similarity >= EMBEDDING_SIMILARITY_THRESHOLD
+    ]
+    highly_similar_jobs_with_data.sort(key=lambda x: x['similarity'], reverse=True)
 
-            if job_desc_text_for_embedding.strip():
-                embedding = get_text_embedding(job_desc_text_for_embedding, title=job_title_for_embed)
-                if embedding:
-                    job_embeddings_data.append({'original_index': index, 'embedding': embedding, 'title': job_title_for_embed, 'url': job_url_for_embed})
+    if len(highly_similar_jobs_with_data) > max_jobs:
+        highly_similar_jobs_with_data = highly_similar_jobs_with_data[:int(max_jobs)]
 
-            if (i + 1) % 50 == 0:
-                print(f"  Generated embeddings for {i + 1}/{len(df_jobs_initial)} jobs...")
-        print("Finished generating job embeddings.")
+    if not highly_similar_jobs_with_data:
+        print("No jobs met the embedding similarity threshold.")
+        return pd.DataFrame()
 
-        if job_embeddings_data:
-            job_embeddings_matrix = np.array([item['embedding'] for item in job_embeddings_data])
-            similarities = cosine_similarity(np.array(resume_embedding).reshape(1, -1), job_embeddings_matrix)[0]
+    filtered_original_indices = [item['original_index'] for item in highly_similar_jobs_with_data]
+    jobs_to_process_further_df = df_jobs_initial.loc[filtered_original_indices].copy()
+    jobs_to_process_further_df['embedding_similarity'] = [float(item['similarity']) for item in highly_similar_jobs_with_data]
+    print(f"Embedding pre-filtering selected {len(jobs_to_process_further_df)} jobs for deeper LLM analysis.")
+    return jobs_to_process_further_df
 
-            for i, item in enumerate(job_embeddings_data):
-                item['similarity'] = similarities[i]
+def filter_jobs_by_embedding(df_jobs_initial, resume_embedding, max_jobs=None):
+    """Keep the jobs most similar to the resume, best first"""
+    print("\n--- Starting Embedding Pre-filtering ---")
+    original_indices, job_embeddings_matrix = embed_jobs(df_jobs_initial)
 
-            highly_similar_jobs_with_data = [item for item in job_embeddings_data if item['similarity'] >= EMBEDDING_SIMILARITY_THRESHOLD]
-            highly_similar_jobs_with_data.sort(key=lambda x: x['similarity'], reverse=True)
+    if not original_indices:
+        print("Could not generate embeddings for any jobs.")
+        return df_jobs_initial
 
-            if len(highly_similar_jobs_with_data) > MAX_JOBS_AFTER_EMBEDDING_FILTER:
-                highly_similar_jobs_with_data = highly_similar_jobs_with_data[:MAX_JOBS_AFTER_EMBEDDING_FILTER]
+    similarities = cosine_similarity(np.array(resume_embedding).reshape(1, -1), job_embeddings_matrix)[0]
+    return select_jobs_by_similarity(df_jobs_initial, original_indices, similarities, max_jobs)
 
-            if highly_similar_jobs_with_data:
-                filtered_original_indices = [item['original_index'] for item in highly_similar_jobs_with_data]
-                jobs_to_process_further_df = df_jobs_initial.loc[filtered_original_indices].copy()
-                print(f"Embedding pre-filtering selected {len(jobs_to_process_further_df)} jobs for deeper LLM analysis.")
-            else:
-                print("No jobs met the embedding similarity threshold.")
-                jobs_to_process_further_df = pd.DataFrame()
-        else:
-            print("Could not generate embeddings for any jobs.")
-    else:
-        print("\nSkipping embedding pre-filtering.")
+def cap_jobs_for_llm(jobs_to_process_further_df):
+    """Apply the MAX_JOBS_TO_ANALYZE_WITH_LLM cap (lifted when an LLM budget is set)"""
+    if jobs_to_process_further_df.empty:
+        return pd.DataFrame()
+    max_jobs = llm_job_cap()
+    if len(jobs_to_process_further_df) > max_jobs:
+        final_jobs_for_llm_df = jobs_to_process_further_df.head(int(max_jobs))
+        print(f"\nCapping LLM analysis to the first {len(final_jobs_for_llm_df)} selected jobs due to MAX_JOBS_TO_ANALYZE_WITH_LLM.")
+        return final_jobs_for_llm_df
+    return jobs_to_process_further_df
+
+def build_dedup_text(row):
+    """Text that decides whether two postings are duplicates: what the embedding and LLM see"""
+    pref_quals_list = get_job_pref_quals(row)
+    resp_list = get_job_responsibilities(row)
+    if not pref_quals_list and not resp_list:
+        # Nothing but a title to go on; never merge these
+        return ""
+    return f"{row.get(TITLE_COL, '')}\n{' '.join(pref_quals_list)}\n{' '.join(resp_list)}"
 
-    # 4. Apply MAX_JOBS_TO_ANALYZE_WITH_LLM cap
-    if not jobs_to_process_further_df.empty:
-        if len(jobs_to_process_further_df) > MAX_JOBS_TO_ANALYZE_WITH_LLM:
-            final_jobs_for_llm_df = jobs_to_process_further_df.head(int(MAX_JOBS_TO_ANALYZE_WITH_LLM))
-            print(f"\nCapping LLM analysis to the first {len(final_jobs_for_llm_df)} selected jobs due to MAX_JOBS_TO_ANALYZE_WITH_LLM.")
+def dedupe_jobs(df_jobs):
+    """Group exact and near-duplicate postings.
+
+    Returns (representatives_df, duplicates) where duplicates maps a representative's index
+    to the indices of the other postings in its cluster.
+    """
+    labels = cluster_texts([build_dedup_text(row) for _, row in df_jobs.iterrows()])
+    job_indices = list(df_jobs.index)
+    duplicates = {}
+    representative_indices = []
+    for position, label in enumerate(labels):
+        if label == position:
+            representative_indices.append(job_indices[position])
         else:
-            final_jobs_for_llm_df = jobs_to_process_further_df
-    else:
-        final_jobs_for_llm_df = pd.DataFrame()
+            duplicates.setdefault(job_indices[label], []).append(job_indices[position])
+
+    duplicate_count = len(df_jobs) - len(representative_indices)
+    if duplicate_count:
+        print(f"Deduplication: {len(df_jobs)} postings form {len(representative_indices)} distinct jobs ({duplicate_count} duplicates).")
+    return df_jobs.loc[representative_indices], duplicates
+
+def get_assessment_job_key(row, index):
+    """The job_url an assessment is recorded under (see assess_jobs_with_llm)"""
+    return str(row.get(URL_COL, row.get('job_id_unique', f"fallback_id_{index}"))).strip()
+
+def fan_out_assessments(all_llm_assessments, assessed_jobs_df, df_jobs, duplicates):
+    """Copy each representative's assessment to the other members of its cluster"""
+    if not duplicates:
+        return all_llm_assessments
+    index_by_job_key = {get_assessment_job_key(row, index): index for index, row in assessed_jobs_df.iterrows()}
+    fanned_out_assessments = []
+    for assessment_json in all_llm_assessments:
+        fanned_out_assessments.append(assessment_json)
+        for member_index in duplicates.get(index_by_job_key.get(assessment_json.get('job_url')), []):
+            member_row = df_jobs.loc[member_index]
+            fanned_out_assessments.append({
+                **assessment_json,
+                'job_title': str(member_row.get(TITLE_COL, "N/A")).strip(),
+                'job_url': get_assessment_job_key(member_row, member_index),
+                'duplicate_of': assessment_json.get('job_url'),
+            })
+    return fanned_out_assessments
+
+def build_llm_job_details(row):
+    """Format a job's preferred qualifications and responsibilities for the LLM prompt"""
+    pref_quals_list = get_job_pref_quals(row)
+    resp_list = get_job_responsibilities(row)
+
+    job_pref_quals_text = "\n".join(f"- {item}" for item in pref_quals_list) if pref_quals_list else "Not specified."
+    job_responsibilities_text = "\n".join(f"- {item}" for item in resp_list) if resp_list else "Not specified."
+
+    return (
+        f"Preferred Qualifications:\n{job_pref_quals_text}\n\n"
+        f"Responsibilities:\n{job_responsibilities_text}"
+    )
+
+def assess_jobs_with_llm(final_jobs_for_llm_df, resume_text, cache_scope=None, candidate_notes=DEFAULT_CANDIDATE_NOTES):
+    """Run the LLM assessment for every selected job.
 
+    API errors and unparseable responses go to a retry queue that is worked through after the first pass,
+    with exponential backoff between rounds. Jobs still failing after LLM_MAX_ATTEMPTS are negative-cached.
+    """
     print(f"\n--- LLM Analysis: Preparing to process {len(final_jobs_for_llm_df)} jobs ---")
 
+    # Highest expected value first, so a deadline or budget stop keeps the best candidates
+    if 'embedding_similarity' in final_jobs_for_llm_df.columns:
+        final_jobs_for_llm_df = final_jobs_for_llm_df.sort_values('embedding_similarity', ascending=False, kind='stable')
+
     all_llm_assessments = []
+    retry_queue = []
     jobs_processed_count = 0
+    budget_skipped_count = 0
 
     for index, row in final_jobs_for_llm_df.iterrows():
         jobs_processed_count += 1
-        job_title = str(row.get(title_col, "N/A")).strip()
-        job_url = str(row.get(url_col, row.get('job_id_unique', f"fallback_id_{index}"))).strip()
+        job_title = str(row.get(TITLE_COL, "N/A")).strip()
+        job_url = get_assessment_job_key(row, index)
 
         print(f"\n({jobs_processed_count}/{len(final_jobs_for_llm_df)}) Analyzing Job for LLM: {job_title}")
 
-        pref_quals_list = [str(row.get(col, "")).strip() for col in pref_qual_cols if pd.notna(row.get(col)) and str(row.get(col)).strip()]
-        resp_list = [str(row.get(col, "")).strip() for col in responsibility_cols if pd.notna(row.get(col)) and str(row.get(col)).strip()]
+        job_details_for_llm = build_llm_job_details(row)
 
-        job_pref_quals_text = "\n".join(f"- {item}" for item in pref_quals_list) if pref_quals_list else "Not specified."
-        job_responsibilities_text = "\n".join(f"- {item}" for item in resp_list) if resp_list else "Not specified."
+        assessment_json = get_llm_assessment_json(resume_text, job_details_for_llm, job_title, job_url,
+                                                  cache_scope=cache_scope, candidate_notes=candidate_notes)
 
-        job_details_for_llm = (
-            f"Preferred Qualifications:\n{job_pref_quals_text}\n\n"
-            f"Responsibilities:\n{job_responsibilities_text}"
-        )
-
-        assessment_json = get_llm_assessment_json(resume_text, job_details_for_llm, job_title, job_url)
+        if assessment_json.get('error_type') == 'budget':
+            # Keep going: later jobs may still be answered from the cache for free
+            if budget_skipped_count == 0:
+                print(f"  {assessment_json['error']}; remaining jobs are only taken from the cache.")
+            budget_skipped_count += 1
+            continue
 
         if 'error' in assessment_json:
             print(f"  ERROR for {job_title}: {assessment_json['error'][:200]}...")
+            if is_retryable_assessment(assessment_json):
+                retry_queue.append((len(all_llm_assessments), job_details_for_llm, job_title, job_url))
 
         all_llm_assessments.append(assessment_json)
 
@@ -307,85 +796,609 @@ def main():
 
         time.sleep(0.5)
 
+    attempt = 1
+    while retry_queue and attempt < LLM_MAX_ATTEMPTS:
+        budget_reason = llm_budget_exhausted()
+        if budget_reason:
+            print(f"\nNot retrying {len(retry_queue)} failed assessments: {budget_reason}.")
+            retry_queue = []
+            break
+        backoff = LLM_RETRY_BACKOFF_SECONDS * (2 ** (attempt - 1))
+        attempt += 1
+        print(f"\nRetrying {len(retry_queue)} failed assessments in {backoff}s (attempt {attempt}/{LLM_MAX_ATTEMPTS})...")
+        time.sleep(backoff)
+
+        still_failing = []
+        for position, job_details_for_llm, job_title, job_url in retry_queue:
+            assessment_json = get_llm_assessment_json(resume_text, job_details_for_llm, job_title, job_url,
+                                                      cache_scope=cache_scope, candidate_notes=candidate_notes)
+            if assessment_json.get('error_type') == 'budget':
+                # Keep the previous failure; the budget ran out mid-round
+                continue
+            all_llm_assessments[position] = assessment_json
+            if is_retryable_assessment(assessment_json):
+                still_failing.append((position, job_details_for_llm, job_title, job_url))
+            time.sleep(0.5)
+        print(f"  {len(retry_queue) - len(still_failing)} recovered, {len(still_failing)} still failing.")
+        retry_queue = still_failing
+
+    for position, _, job_title, job_url in retry_queue:
+        print(f"  Giving up on {job_title} after {attempt} attempts; negative-caching for {NEGATIVE_CACHE_TTL_HOURS}h.")
+        record_llm_failure(llm_cache_key(job_url, cache_scope), all_llm_assessments[position], attempt)
+
     save_cache()
-    print("\nFinished LLM processing.")
+    if budget_skipped_count:
+        print(f"\nStopped early: {budget_skipped_count} lower-ranked jobs were not assessed (budget or deadline).")
+    print(f"\nFinished LLM processing. LLM calls this run: {llm_usage['calls']}, tokens: {llm_usage['tokens']}.")
+    return all_llm_assessments
 
-    # 5. Post-Process, Filter, and Display/Save
+# --- Fit Triage ---
+def parse_fit_score(assessment):
+    try:
+        return int(float(assessment.get('fit_score')))
+    except (TypeError, ValueError):
+        return None
+
+def triage_jobs(final_jobs_for_llm_df, resume_embedding, cache_scope=None):
+    """Decide the jobs the triage model is confident about without calling the LLM.
+
+    Returns (jobs_for_llm_df, triage_assessments, pending). pending maps the cache key of every uncached job
+    sent to the LLM to (features, accept probability or None, audited), for record_triage_outcomes.
+    """
+    if final_jobs_for_llm_df.empty or resume_embedding is None:
+        return final_jobs_for_llm_df, [], {}
+    print(f"\n--- Fit Triage: {len(final_jobs_for_llm_df)} jobs ---")
+
+    job_rows = []
+    for index, row in final_jobs_for_llm_df.iterrows():
+        job_title = str(row.get(TITLE_COL, "N/A")).strip()
+        job_url = get_assessment_job_key(row, index)
+        job_desc_text_for_embedding = build_embedding_text(row)
+        embedding = get_job_embedding(job_desc_text_for_embedding, job_title) if job_desc_text_for_embedding.strip() else None
+        job_rows.append((index, job_title, job_url, llm_cache_key(job_url, cache_scope), embedding))
+
+    embedded_rows = [job_row for job_row in job_rows if job_row[4] is not None]
+    if not embedded_rows:
+        return final_jobs_for_llm_df, [], {}
+    features = fit_triage.triage_features(resume_embedding, np.stack([job_row[4] for job_row in embedded_rows]))
+    features_by_key = {job_row[3]: job_features for job_row, job_features in zip(embedded_rows, features)}
+
+    # Cached LLM assessments of jobs in this run become labels (bootstraps the label set from past runs)
+    for cache_key, job_features in features_by_key.items():
+        cached_assessment = llm_response_cache.get(cache_key)
+        if cached_assessment and cache_key not in fit_triage.triage_labels:
+            fit_score = parse_fit_score(cached_assessment)
+            if fit_score is not None:
+                fit_triage.add_label(cache_key, job_features, fit_score, is_shortlisted(cached_assessment))
+
+    model = fit_triage.train_triage_model(features.shape[1])
+    uncached_keys = [cache_key for cache_key in features_by_key if cache_key not in llm_response_cache]
+    predictions = {}
+    if model is not None and uncached_keys:
+        probabilities, fit_scores = fit_triage.predict(model, np.stack([features_by_key[key] for key in uncached_keys]))
+        predictions = dict(zip(uncached_keys, zip(probabilities.tolist(), fit_scores.tolist())))
+
+    llm_indices = []
+    triage_assessments = []
+    pending = {}
+    for index, job_title, job_url, cache_key, _ in job_rows:
+        if cache_key not in features_by_key or cache_key in llm_response_cache:
+            # Cached answers are free; jobs without an embedding cannot be triaged
+            llm_indices.append(index)
+            continue
+        probability, predicted_score = predictions.get(cache_key, (None, None))
+        confident = probability is not None and fit_triage.is_confident(probability)
+        if confident and not fit_triage.is_audit_sample(cache_key):
+            accepted = probability >= fit_triage.TRIAGE_ACCEPT_PROBABILITY
+            fit_score = int(round(predicted_score))
+            triage_assessments.append({
+                "job_title": job_title,
+                "job_url": job_url,
+                "fit_score": max(fit_score, DESIRED_FIT_SCORE_THRESHOLD) if accepted else min(fit_score, DESIRED_FIT_SCORE_THRESHOLD - 1),
+                "fit_category": TRIAGE_ACCEPT_CATEGORY if accepted else TRIAGE_REJECT_CATEGORY,
+                "key_matches": [],
+                "potential_gaps": [],
+                "reasoning_summary": f"Decided by the triage model without an LLM review (accept probability {probability:.2f}).",
+                "auto_drafted_outreach_snippet": "",
+                "triage_probability": round(probability, 3),
+            })
+            continue
+        llm_indices.append(index)
+        pending[cache_key] = (features_by_key[cache_key], probability, confident)
+
+    if model is not None:
+        accepted_count = sum(1 for assessment in triage_assessments if assessment['fit_category'] == TRIAGE_ACCEPT_CATEGORY)
+        print(f"Triage decided {len(triage_assessments)} jobs without the LLM ({accepted_count} accepted, "
+              f"{len(triage_assessments) - accepted_count} rejected); {len(llm_indices)} go to the LLM.")
+    return final_jobs_for_llm_df.loc[llm_indices], triage_assessments, pending
+
+def record_triage_outcomes(all_llm_assessments, pending, cache_scope=None):
+    """Add new LLM assessments as triage labels and report how often the model agreed with the LLM"""
+    if not pending:
+        return
+    new_labels = 0
+    agreed, compared = 0, 0
+    audit_agreed, audited = 0, 0
+    for assessment in all_llm_assessments:
+        cache_key = llm_cache_key(assessment.get('job_url', ''), cache_scope)
+        fit_score = parse_fit_score(assessment)
+        if 'error' in assessment or cache_key not in pending or fit_score is None:
+            continue
+        job_features, probability, was_audited = pending[cache_key]
+        accepted = is_shortlisted(assessment)
+        fit_triage.add_label(cache_key, job_features, fit_score, accepted)
+        new_labels += 1
+        if probability is None:
+            continue
+        agrees = (probability >= 0.5) == accepted
+        compared += 1
+        agreed += agrees
+        if was_audited:
+            audited += 1
+            audit_agreed += agrees
+
+    if compared:
+        print(f"Triage agreement with the LLM: {agreed}/{compared} ({agreed / compared:.0%}) of assessed jobs, "
+              f"{audit_agreed}/{audited} of audited confident decisions.")
+    print(f"Added {new_labels} triage labels ({len(fit_triage.triage_labels)} total).")
+    if cache_writes_enabled:
+        fit_triage.save_labels()
+
+def build_analysis_results(df_jobs_initial, all_llm_assessments, output_csv_name=OUTPUT_CSV_NAME, shortlisted_csv_name=SHORTLISTED_CSV_NAME):
+    """Join assessments back onto their jobs and build the shortlist.
+
+    Returns (df_all_analyzed, shortlisted_jobs_df). CSV files are only written when a name is given.
+    """
     print("\n\n--- Final Results and Shortlist Generation ---")
     if not all_llm_assessments:
         print("No LLM assessments were generated.")
-    else:
-        enriched_assessments = []
-        
-        for i, assessment_result in enumerate(all_llm_assessments):
-            original_row_data = {}
-            if 'job_url' in assessment_result:
-                matched_rows = df_jobs_initial[df_jobs_initial[url_col] == assessment_result['job_url']]
-                if not matched_rows.empty:
-                     original_row_data = matched_rows.iloc[0].to_dict()
-                else:
-                    matched_rows_id = df_jobs_initial[df_jobs_initial['job_id_unique'] == assessment_result['job_url']]
-                    if not matched_rows_id.empty:
-                        original_row_data = matched_rows_id.iloc[0].to_dict()
-
-            combined_data = {**original_row_data, **assessment_result}
-            enriched_assessments.append(combined_data)
-
-        df_all_analyzed = pd.DataFrame(enriched_assessments)
-
-        if not df_all_analyzed.empty:
-            try:
-                df_all_analyzed.to_csv(OUTPUT_CSV_NAME, index=False)
-                print(f"\nAll analyzed job results saved to: {OUTPUT_CSV_NAME}")
-            except Exception as e:
-                print(f"Error saving all analyzed jobs CSV: {e}")
-
-        if 'error' in df_all_analyzed.columns:
-            df_successful_assessments = df_all_analyzed[~df_all_analyzed['error'].notna() & df_all_analyzed['fit_score'].notna()].copy()
-        else:
-            df_successful_assessments = df_all_analyzed[df_all_analyzed['fit_score'].notna()].copy()
-
-        if not df_successful_assessments.empty:
-            print(f"\nTotal successful LLM assessments: {len(df_successful_assessments)}")
-
-            df_successful_assessments['fit_score'] = pd.to_numeric(df_successful_assessments['fit_score'], errors='coerce')
-            df_successful_assessments.dropna(subset=['fit_score'], inplace=True)
-            df_successful_assessments['fit_score'] = df_successful_assessments['fit_score'].astype(int)
-
-            desired_fit_score_threshold = 7
-            desired_categories = ["Strong Fit", "Potential Fit"]
-
-            shortlisted_jobs_df = df_successful_assessments[
-                (df_successful_assessments['fit_score'] >= desired_fit_score_threshold) &
-                (df_successful_assessments['fit_category'].isin(desired_categories))
-            ].copy()
-
-            if not shortlisted_jobs_df.empty:
-                shortlisted_jobs_df.sort_values("fit_score", ascending=False, inplace=True)
-                print(f"\n--- Shortlisted Jobs (Score >= {desired_fit_score_threshold}) ---")
-                for _, job_row in shortlisted_jobs_df.head(10).iterrows():
-                    print(f"\nJob Title: {job_row['job_title']}")
-                    print(f"URL: {job_row['job_url']}")
-                    print(f"Fit Score: {job_row.get('fit_score', 'N/A')}/10")
-                    print(f"Fit Category: {job_row.get('fit_category', 'N/A')}")
-                    
-                    key_matches_list = job_row.get('key_matches', [])
-                    potential_gaps_list = job_row.get('potential_gaps', [])
-                    print(f"Key Matches: {', '.join(key_matches_list) if isinstance(key_matches_list, list) else 'N/A'}")
-                    print(f"Potential Gaps: {', '.join(potential_gaps_list) if isinstance(potential_gaps_list, list) else 'N/A'}")
-                    print(f"Outreach Snippet: {job_row.get('auto_drafted_outreach_snippet', 'N/A')}")
-                    print("-" * 30)
-
-                try:
-                    shortlisted_jobs_df.to_csv(SHORTLISTED_CSV_NAME, index=False)
-                    print(f"\nShortlisted jobs ({len(shortlisted_jobs_df)}) saved to: {SHORTLISTED_CSV_NAME}")
-                except Exception as e:
-                    print(f"Error saving shortlisted jobs CSV: {e}")
+        return pd.DataFrame(), pd.DataFrame()
 
+    enriched_assessments = []
+
+    for i, assessment_result in enumerate(all_llm_assessments):
+        original_row_data = {}
+        if 'job_url' in assessment_result:
+            matched_rows = df_jobs_initial[df_jobs_initial[URL_COL] == assessment_result['job_url']]
+            if not matched_rows.empty:
+                 original_row_data = matched_rows.iloc[0].to_dict()
             else:
-                print(f"\nNo jobs met the shortlisting criteria.")
+                matched_rows_id = df_jobs_initial[df_jobs_initial['job_id_unique'] == assessment_result['job_url']]
+                if not matched_rows_id.empty:
+                    original_row_data = matched_rows_id.iloc[0].to_dict()
+
+        combined_data = {**original_row_data, **assessment_result}
+        enriched_assessments.append(combined_data)
+
+    df_all_analyzed = pd.DataFrame(enriched_assessments)
+
+    if not df_all_analyzed.empty and output_csv_name:
+        try:
+            flatten_job_list_fields(df_all_analyzed).to_csv(output_csv_name, index=False)
+            print(f"\nAll analyzed job results saved to: {output_csv_name}")
+        except Exception as e:
+            print(f"Error saving all analyzed jobs CSV: {e}")
+
+    return df_all_analyzed, build_shortlist(df_all_analyzed, shortlisted_csv_name)
+
+def build_shortlist(df_all_analyzed, shortlisted_csv_name=SHORTLISTED_CSV_NAME):
+    """Filter successful assessments down to the shortlist, print the top jobs and optionally save it"""
+    if 'fit_score' not in df_all_analyzed.columns:
+        df_successful_assessments = pd.DataFrame()
+    elif 'error' in df_all_analyzed.columns:
+        df_successful_assessments = df_all_analyzed[~df_all_analyzed['error'].notna() & df_all_analyzed['fit_score'].notna()].copy()
+    else:
+        df_successful_assessments = df_all_analyzed[df_all_analyzed['fit_score'].notna()].copy()
+
+    if df_successful_assessments.empty:
+        print("\nNo successful LLM assessments to create a shortlist from.")
+        return pd.DataFrame()
+
+    print(f"\nTotal successful LLM assessments: {len(df_successful_assessments)}")
+
+    df_successful_assessments['fit_score'] = pd.to_numeric(df_successful_assessments['fit_score'], errors='coerce')
+    df_successful_assessments.dropna(subset=['fit_score'], inplace=True)
+    df_successful_assessments['fit_score'] = df_successful_assessments['fit_score'].astype(int)
+
+    desired_fit_score_threshold = DESIRED_FIT_SCORE_THRESHOLD
+    desired_categories = DESIRED_CATEGORIES
+
+    shortlisted_jobs_df = df_successful_assessments[
+        (df_successful_assessments['fit_score'] >= desired_fit_score_threshold) &
+        (df_successful_assessments['fit_category'].isin(desired_categories))
+    ].copy()
+
+    if shortlisted_jobs_df.empty:
+        print(f"\nNo jobs met the shortlisting criteria.")
+        return shortlisted_jobs_df
+
+    shortlisted_jobs_df.sort_values("fit_score", ascending=False, inplace=True)
+    print(f"\n--- Shortlisted Jobs (Score >= {desired_fit_score_threshold}) ---")
+    for _, job_row in shortlisted_jobs_df.head(10).iterrows():
+        print(f"\nJob Title: {job_row['job_title']}")
+        print(f"URL: {job_row['job_url']}")
+        print(f"Fit Score: {job_row.get('fit_score', 'N/A')}/10")
+        print(f"Fit Category: {job_row.get('fit_category', 'N/A')}")
+
+        key_matches_list = job_row.get('key_matches', [])
+        potential_gaps_list = job_row.get('potential_gaps', [])
+        print(f"Key Matches: {', '.join(key_matches_list) if isinstance(key_matches_list, list) else 'N/A'}")
+        print(f"Potential Gaps: {', '.join(potential_gaps_list) if isinstance(potential_gaps_list, list) else 'N/A'}")
+        print(f"Outreach Snippet: {job_row.get('auto_drafted_outreach_snippet', 'N/A')}")
+        print("-" * 30)
+
+    if shortlisted_csv_name:
+        try:
+            flatten_job_list_fields(shortlisted_jobs_df).to_csv(shortlisted_csv_name, index=False)
+            print(f"\nShortlisted jobs ({len(shortlisted_jobs_df)}) saved to: {shortlisted_csv_name}")
+        except Exception as e:
+            print(f"Error saving shortlisted jobs CSV: {e}")
+
+    return shortlisted_jobs_df
+
+def analyze_jobs(df_jobs_initial, resume_text, use_embedding_pre_filtering=DEFAULT_USE_EMBEDDING_PRE_FILTERING,
+                 output_csv_name=OUTPUT_CSV_NAME, shortlisted_csv_name=SHORTLISTED_CSV_NAME,
+                 max_jobs_after_embedding_filter=None, load_caches=True):
+    """Run embedding pre-filtering, LLM assessment and shortlisting on an in-memory jobs DataFrame.
+
+    Returns (df_all_analyzed, shortlisted_jobs_df). Pass None for a CSV name to skip writing it.
+    """
+    if load_caches:
+        load_cache()
+        load_embedding_cache()
+    add_job_ids(df_jobs_initial)
+
+    resume_embedding = None
+    if use_embedding_pre_filtering:
+        print("Generating resume embedding...")
+        resume_embedding = get_text_embedding(resume_text, task_type="RETRIEVAL_QUERY", title="Candidate Resume")
+        if not resume_embedding:
+            print("Could not generate resume embedding. Disabling embedding pre-filtering.")
+            use_embedding_pre_filtering = False
         else:
-            print("\nNo successful LLM assessments to create a shortlist from.")
+            print("Resume embedding generated.")
+
+    # Deduplicate so each distinct posting is embedded and assessed once
+    df_candidates = df_jobs_initial
+    duplicates = {}
+    if DEDUPLICATE_JOBS:
+        df_candidates, duplicates = dedupe_jobs(df_jobs_initial)
+
+    jobs_to_process_further_df = df_candidates
+
+    # Embedding-Based Pre-filtering (if enabled)
+    if use_embedding_pre_filtering and resume_embedding is not None:
+        jobs_to_process_further_df = filter_jobs_by_embedding(df_candidates, resume_embedding, max_jobs_after_embedding_filter)
+    else:
+        print("\nSkipping embedding pre-filtering.")
+
+    # Apply MAX_JOBS_TO_ANALYZE_WITH_LLM cap
+    final_jobs_for_llm_df = cap_jobs_for_llm(jobs_to_process_further_df)
+
+    jobs_for_llm_df, triage_assessments, triage_pending = final_jobs_for_llm_df, [], {}
+    if TRIAGE_JOBS and use_embedding_pre_filtering:
+        jobs_for_llm_df, triage_assessments, triage_pending = triage_jobs(final_jobs_for_llm_df, resume_embedding)
+
+    all_llm_assessments = assess_jobs_with_llm(jobs_for_llm_df, resume_text)
+    record_triage_outcomes(all_llm_assessments, triage_pending)
+    all_llm_assessments = all_llm_assessments + triage_assessments
+    all_llm_assessments = fan_out_assessments(all_llm_assessments, final_jobs_for_llm_df, df_jobs_initial, duplicates)
+
+    return build_analysis_results(df_jobs_initial, all_llm_assessments, output_csv_name, shortlisted_csv_name)
+
+# --- Streaming Mode ---
+# Bounded-memory variant of analyze_jobs for very large CSVs: the input is read in chunks with only the
+# columns the analyzer needs, only a running top-k of jobs is kept for the LLM, and analyzed rows are
+# appended to the output CSV as they complete.
+STREAMING_CHUNK_SIZE = 2000
+STREAMING_JOB_COLUMNS = [TITLE_COL, URL_COL, 'location', 'experience_level', 'job_id_unique'] + PREF_QUAL_COLS + RESPONSIBILITY_COLS
+ASSESSMENT_FIELDS = ["job_title", "job_url", "fit_score", "fit_category", "key_matches", "potential_gaps",
+                     "reasoning_summary", "auto_drafted_outreach_snippet", "error", "error_type"]
+
+def iter_job_chunks(csv_file_name, chunk_size=STREAMING_CHUNK_SIZE):
+    """Yield DataFrame chunks of the jobs CSV holding only STREAMING_JOB_COLUMNS"""
+    wanted_columns = set(STREAMING_JOB_COLUMNS)
+    reader = pd.read_csv(csv_file_name, usecols=lambda col: col in wanted_columns, dtype=str, chunksize=chunk_size)
+    for chunk in reader:
+        # Chunk indices continue across chunks, so job ids match the ones built for a full load
+        yield add_job_ids(chunk)
+
+def is_shortlisted(assessment):
+    try:
+        fit_score = int(float(assessment.get('fit_score')))
+    except (TypeError, ValueError):
+        return False
+    return fit_score >= DESIRED_FIT_SCORE_THRESHOLD and assessment.get('fit_category') in DESIRED_CATEGORIES
+
+def analyze_jobs_streaming(csv_file_name, resume_text, output_csv_name=OUTPUT_CSV_NAME,
+                           shortlisted_csv_name=SHORTLISTED_CSV_NAME, chunk_size=STREAMING_CHUNK_SIZE):
+    """Streaming analysis of a jobs CSV. Returns the shortlisted jobs DataFrame."""
+    load_cache()
+    # Embeddings are looked up through memory maps, never loaded as a whole
+    open_streaming_embedding_cache()
+
+    print("Generating resume embedding...")
+    resume_embedding = get_text_embedding(resume_text, task_type="RETRIEVAL_QUERY", title="Candidate Resume")
+    if not resume_embedding:
+        print("Could not generate resume embedding. Streaming mode needs embedding pre-filtering. Exiting.")
+        return pd.DataFrame()
+    resume_vector = np.asarray(resume_embedding, dtype=np.float32)
+    resume_vector /= np.linalg.norm(resume_vector) or 1.0
+
+    # 1. Stream the CSV, keeping only a min-heap of the best prefilter_job_cap() jobs
+    print(f"\n--- Streaming Embedding Pre-filtering (chunks of {chunk_size}) ---")
+    max_candidates = prefilter_job_cap(streaming=True)
+    top_jobs_heap = []
+    jobs_seen = 0
+    try:
+        for chunk in iter_job_chunks(csv_file_name, chunk_size):
+            chunk_rows = []
+            chunk_embeddings = []
+            for _, row in chunk.iterrows():
+                embedding = get_streaming_job_embedding(build_embedding_text(row), str(row.get(TITLE_COL, "")).strip())
+                if embedding is not None:
+                    chunk_rows.append(row)
+                    chunk_embeddings.append(embedding)
+            jobs_seen += len(chunk)
+
+            if chunk_embeddings:
+                chunk_matrix = np.stack(chunk_embeddings)
+                norms = np.linalg.norm(chunk_matrix, axis=1)
+                norms[norms == 0] = 1.0
+                similarities = (chunk_matrix @ resume_vector) / norms
+
+                for row, similarity in zip(chunk_rows, similarities):
+                    if similarity < EMBEDDING_SIMILARITY_THRESHOLD:
+                        continue
+                    entry = (float(similarity), row['job_id_unique'], row.to_dict())
+                    if len(top_jobs_heap) < max_candidates:
+                        heapq.heappush(top_jobs_heap, entry)
+                    elif entry[:2] > top_jobs_heap[0][:2]:
+                        heapq.heapreplace(top_jobs_heap, entry)
+            print(f"  Embedded {jobs_seen} jobs so far, {len(top_jobs_heap)} candidates kept...")
+    except FileNotFoundError:
+        print(f"Error: CSV file '{csv_file_name}' not found. Please run the job scraper first.")
+        return pd.DataFrame()
+
+    top_jobs = [job for _, _, job in sorted(top_jobs_heap, key=lambda entry: entry[:2], reverse=True)]
+    if len(top_jobs) > llm_job_cap():
+        top_jobs = top_jobs[:int(llm_job_cap())]
+    print(f"Embedding pre-filtering selected {len(top_jobs)} of {jobs_seen} jobs for deeper LLM analysis.")
+
+    # 2. Assess and append each result to the output CSV as it completes
+    print(f"\n--- LLM Analysis: Preparing to process {len(top_jobs)} jobs ---")
+    fieldnames = STREAMING_JOB_COLUMNS + [field for field in ASSESSMENT_FIELDS if field not in STREAMING_JOB_COLUMNS]
+    shortlisted_rows = []
+    budget_skipped_count = 0
+    output_file = open(output_csv_name, 'w', newline='', encoding='utf-8') if output_csv_name else None
+    try:
+        writer = None
+        if output_file:
+            writer = csv.DictWriter(output_file, fieldnames=fieldnames, extrasaction='ignore')
+            writer.writeheader()
+
+        for jobs_processed_count, job in enumerate(top_jobs, 1):
+            job_title = str(job[TITLE_COL]).strip() if pd.notna(job.get(TITLE_COL)) else "N/A"
+            job_url = str(job[URL_COL]).strip() if pd.notna(job.get(URL_COL)) else str(job['job_id_unique'])
+            print(f"\n({jobs_processed_count}/{len(top_jobs)}) Analyzing Job for LLM: {job_title}")
+
+            assessment_json = get_llm_assessment_with_retries(resume_text, build_llm_job_details(job), job_title, job_url)
+            if assessment_json.get('error_type') == 'budget':
+                if budget_skipped_count == 0:
+                    print(f"  {assessment_json['error']}; remaining jobs are only taken from the cache.")
+                budget_skipped_count += 1
+                continue
+            if 'error' in assessment_json:
+                print(f"  ERROR for {job_title}: {assessment_json['error'][:200]}...")
+
+            combined_data = {**job, **assessment_json}
+            if writer:
+                writer.writerow(combined_data)
+                output_file.flush()
+            if 'error' not in assessment_json and is_shortlisted(assessment_json):
+                shortlisted_rows.append(combined_data)
+
+            if jobs_processed_count % 10 == 0:
+                save_cache()
+            time.sleep(0.5)
+    finally:
+        if output_file:
+            output_file.close()
+    save_cache()
+    if budget_skipped_count:
+        print(f"\nStopped early: {budget_skipped_count} lower-ranked jobs were not assessed (budget or deadline).")
+    print("\nFinished LLM processing.")
+    if output_csv_name and top_jobs:
+        print(f"\nAll analyzed job results saved to: {output_csv_name}")
+
+    if not shortlisted_rows:
+        print("\nNo jobs met the shortlisting criteria.")
+        return pd.DataFrame()
+
+    shortlisted_jobs_df = pd.DataFrame(shortlisted_rows)
+    shortlisted_jobs_df['fit_score'] = pd.to_numeric(shortlisted_jobs_df['fit_score'], errors='coerce').astype(int)
+    shortlisted_jobs_df.sort_values("fit_score", ascending=False, inplace=True)
+    if shortlisted_csv_name:
+        try:
+            shortlisted_jobs_df.to_csv(shortlisted_csv_name, index=False)
+            print(f"\nShortlisted jobs ({len(shortlisted_jobs_df)}) saved to: {shortlisted_csv_name}")
+        except Exception as e:
+            print(f"Error saving shortlisted jobs CSV: {e}")
+    return shortlisted_jobs_df
+
+# --- Sharded Runs ---
+# `--shard i/N` analyzes only the jobs whose stable hash falls in shard i (1-based) and writes a partial
+# result plus the cache entries it added to SHARD_DIR. `--merge N` combines the shards into the usual
+# analyzed/shortlisted outputs and unions the cache deltas into the main cache files.
+SHARD_DIR = "shards"
+
+def shard_file_names(shard_index, num_shards, shard_dir=SHARD_DIR):
+    suffix = f"{shard_index}_of_{num_shards}"
+    return {
+        'results': os.path.join(shard_dir, f"analyzed_{suffix}.jsonl"),
+        'llm_cache': os.path.join(shard_dir, f"llm_response_cache_{suffix}.json"),
+        'failure_cache': os.path.join(shard_dir, f"llm_failure_cache_{suffix}.json"),
+        'embedding_cache': os.path.join(shard_dir, f"job_embedding_cache_{suffix}.npz"),
+        'triage_labels': os.path.join(shard_dir, f"triage_labels_{suffix}.npz"),
+    }
+
+def parse_shard(shard_spec):
+    """Parse 'i/N' into (i, N) with 1 <= i <= N"""
+    try:
+        shard_index, num_shards = (int(part) for part in shard_spec.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, got {shard_spec!r}")
+    if not 1 <= shard_index <= num_shards:
+        raise argparse.ArgumentTypeError(f"shard index must be between 1 and {num_shards}")
+    return shard_index, num_shards
+
+def job_shard(row, index, num_shards):
+    """Stable shard number (1-based) for a job, keyed on its URL so every worker agrees"""
+    job_key = get_assessment_job_key(row, index)
+    return int(hashlib.sha1(job_key.encode('utf-8')).hexdigest()[:8], 16) % num_shards + 1
+
+def select_shard(df_jobs, shard_index, num_shards):
+    shard_mask = [job_shard(row, index, num_shards) == shard_index for index, row in df_jobs.iterrows()]
+    return df_jobs[shard_mask]
+
+def analyze_shard(df_jobs_initial, resume_text, shard_index, num_shards, shard_dir=SHARD_DIR):
+    """Analyze one shard and write its partial results and cache deltas"""
+    global cache_writes_enabled
+    load_cache()
+    load_embedding_cache()
+    llm_keys_before = set(llm_response_cache)
+    failures_before = dict(llm_failure_cache)
+    embedding_keys_before = set(job_embedding_cache)
+    label_keys_before = set(fit_triage.triage_labels)
+
+    add_job_ids(df_jobs_initial)
+    df_shard = select_shard(df_jobs_initial, shard_index, num_shards)
+    print(f"Shard {shard_index}/{num_shards}: {len(df_shard)} of {len(df_jobs_initial)} jobs")
+
+    # Each shard keeps its share of the pre-filter cap so the merged run assesses about as many jobs.
+    # With a call or token budget (which applies to each shard worker) the budget decides instead.
+    max_jobs_per_shard = None if llm_spend_budget_configured() else -(-MAX_JOBS_AFTER_EMBEDDING_FILTER // num_shards)
+
+    cache_writes_enabled = False
+    try:
+        df_all_analyzed, _ = analyze_jobs(df_shard, resume_text, output_csv_name=None, shortlisted_csv_name=None,
+                                          max_jobs_after_embedding_filter=max_jobs_per_shard, load_caches=False)
+    finally:
+        cache_writes_enabled = True
+
+    file_names = shard_file_names(shard_index, num_shards, shard_dir)
+    os.makedirs(shard_dir, exist_ok=True)
+    # JSON lines keep list fields (key_matches, qualifications) native through the merge
+    df_all_analyzed.to_json(file_names['results'], orient='records', lines=True)
+    with open(file_names['llm_cache'], 'w') as f:
+        json.dump({key: value for key, value in llm_response_cache.items() if key not in llm_keys_before}, f, indent=2)
+    with open(file_names['failure_cache'], 'w') as f:
+        json.dump({key: failure for key, failure in llm_failure_cache.items() if failures_before.get(key) != failure}, f, indent=2)
+    new_embedding_keys = [key for key in job_embedding_cache if key not in embedding_keys_before]
+    if new_embedding_keys:
+        np.savez(file_names['embedding_cache'], keys=np.array(new_embedding_keys),
+                 embeddings=np.stack([job_embedding_cache[key] for key in new_embedding_keys]))
+    fit_triage.save_labels(file_names['triage_labels'],
+                           keys=[key for key in fit_triage.triage_labels if key not in label_keys_before])
+    print(f"Shard {shard_index}/{num_shards}: {len(df_all_analyzed)} analyzed jobs and cache delta written to {shard_dir}/")
+    return df_all_analyzed
+
+def merge_shards(num_shards, shard_dir=SHARD_DIR, output_csv_name=OUTPUT_CSV_NAME, shortlisted_csv_name=SHORTLISTED_CSV_NAME):
+    """Combine shard results into the final outputs and union the cache deltas"""
+    load_cache()
+    load_embedding_cache()
+
+    shard_frames = []
+    for shard_index in range(1, num_shards + 1):
+        file_names = shard_file_names(shard_index, num_shards, shard_dir)
+        if not os.path.exists(file_names['results']):
+            print(f"Warning: shard {shard_index}/{num_shards} results not found ({file_names['results']})")
+            continue
+        try:
+            shard_frames.append(pd.read_json(file_names['results'], orient='records', lines=True))
+        except ValueError:
+            # Empty shard
+            pass
+
+        with open(file_names['llm_cache'], 'r') as f:
+            llm_response_cache.update(json.load(f))
+        with open(file_names['failure_cache'], 'r') as f:
+            for key, failure in json.load(f).items():
+                if key not in llm_response_cache:
+                    llm_failure_cache[key] = failure
+        if os.path.exists(file_names['embedding_cache']):
+            with np.load(file_names['embedding_cache']) as data:
+                job_embedding_cache.update(zip(data['keys'].tolist(), data['embeddings'].astype(np.float32)))
+        if os.path.exists(file_names['triage_labels']):
+            fit_triage.triage_labels.update(fit_triage.read_labels(file_names['triage_labels']))
+
+    # Entries assessed successfully by any shard are no longer failures
+    for key in list(llm_failure_cache):
+        if key in llm_response_cache:
+            del llm_failure_cache[key]
+    save_cache()
+    save_embedding_cache()
+    fit_triage.save_labels()
+    print(f"Merged caches: {len(llm_response_cache)} LLM responses, {len(job_embedding_cache)} job embeddings, "
+          f"{len(fit_triage.triage_labels)} triage labels.")
+
+    print("\n\n--- Final Results and Shortlist Generation ---")
+    shard_frames = [frame for frame in shard_frames if not frame.empty]
+    if not shard_frames:
+        print("No LLM assessments were generated.")
+        return pd.DataFrame(), pd.DataFrame()
+    df_all_analyzed = pd.concat(shard_frames, ignore_index=True)
+    try:
+        df_all_analyzed.to_csv(output_csv_name, index=False)
+        print(f"\nAll analyzed job results ({len(df_all_analyzed)}) from {len(shard_frames)} shards saved to: {output_csv_name}")
+    except Exception as e:
+        print(f"Error saving all analyzed jobs CSV: {e}")
+    return df_all_analyzed, build_shortlist(df_all_analyzed, shortlisted_csv_name)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Analyze scraped jobs against your resume")
+    parser.add_argument('--stream', action='store_true',
+                        help="Bounded-memory mode for very large CSVs (chunked input, top-k pre-filter, incremental output)")
+    parser.add_argument('--shard', type=parse_shard, metavar='i/N',
+                        help=f"Analyze only shard i of N and write partial results to {SHARD_DIR}/")
+    parser.add_argument('--merge', type=int, metavar='N',
+                        help=f"Merge the N shard results in {SHARD_DIR}/ into the final outputs")
+    return parser.parse_args()
+
+def main():
+    """Main function"""
+    args = parse_args()
+    start_time = time.time()
+
+    if args.merge:
+        print(f"--- Merging {args.merge} Shards ---")
+        merge_shards(args.merge)
+        return
+
+    require_api_key()
+    print("--- Starting Full Job Fit Analysis ---")
+
+    # 1. Extract Resume Content
+    resume_text = load_resume_text(PDF_RESUME_FILE_NAME)
+    if not resume_text:
+        return
+
+    if args.stream:
+        # 2-5. Stream, pre-filter, assess and shortlist chunk by chunk
+        analyze_jobs_streaming(CSV_FILE_NAME, resume_text)
+    elif args.shard:
+        df_jobs_initial = load_jobs_csv(CSV_FILE_NAME)
+        if df_jobs_initial is None:
+            return
+        analyze_shard(df_jobs_initial, resume_text, *args.shard)
+    else:
+        # 2. Load Job Data
+        df_jobs_initial = load_jobs_csv(CSV_FILE_NAME)
+        if df_jobs_initial is None:
+            return
+
+        # 3-5. Pre-filter, assess and shortlist
+        analyze_jobs(df_jobs_initial, resume_text)
 
     end_time = time.time()
     total_time = end_time - start_time
@@ -0,0 +1,83 @@
+import hashlib
+import re
+import zlib
+
+import numpy as np
+
+# --- Near-Duplicate Clustering ---
+# Google often lists the same role several times (per location or team variant) with identical or
+# nearly identical text. Postings are grouped by exact fingerprint first, then MinHash/LSH finds
+# near duplicates among the remaining distinct texts, so each cluster is embedded and assessed once.
+NEAR_DUPLICATE_THRESHOLD = 0.9  # Estimated Jaccard similarity of word shingles
+SHINGLE_SIZE = 3
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16  # MINHASH_PERMUTATIONS must be divisible by LSH_BANDS
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_rng = np.random.RandomState(42)
+_HASH_A = _rng.randint(1, _MERSENNE_PRIME, size=MINHASH_PERMUTATIONS).astype(np.int64)
+_HASH_B = _rng.randint(0, _MERSENNE_PRIME, size=MINHASH_PERMUTATIONS).astype(np.int64)
+
+def normalize_text(text):
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return " ".join(re.sub(r'[^\w\s]', ' ', text.lower()).split())
+
+def text_fingerprint(normalized_text):
+    return hashlib.sha1(normalized_text.encode('utf-8')).hexdigest()
+
+def _shingles(normalized_text):
+    words = normalized_text.split()
+    if len(words) < SHINGLE_SIZE:
+        return {zlib.crc32(normalized_text.encode('utf-8'))}
+    return {zlib.crc32(" ".join(words[i:i + SHINGLE_SIZE]).encode('utf-8')) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+def minhash_signature(normalized_text):
+    shingles = np.fromiter(_shingles(normalized_text), dtype=np.int64) % _MERSENNE_PRIME
+    return ((_HASH_A[:, None] * shingles[None, :] + _HASH_B[:, None]) % _MERSENNE_PRIME).min(axis=1)
+
+def _find(parents, i):
+    while parents[i] != i:
+        parents[i] = parents[parents[i]]
+        i = parents[i]
+    return i
+
+def cluster_texts(texts, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """Cluster texts into exact and near duplicates.
+
+    Returns a list with, for every text, the position of its cluster representative (the first member).
+    Empty texts are never clustered.
+    """
+    normalized_texts = [normalize_text(text) if text else "" for text in texts]
+    parents = list(range(len(texts)))
+
+    # 1. Exact duplicates share a fingerprint
+    first_by_fingerprint = {}
+    distinct_positions = []
+    for i, normalized_text in enumerate(normalized_texts):
+        if not normalized_text:
+            continue
+        fingerprint = text_fingerprint(normalized_text)
+        if fingerprint in first_by_fingerprint:
+            parents[i] = first_by_fingerprint[fingerprint]
+        else:
+            first_by_fingerprint[fingerprint] = i
+            distinct_positions.append(i)
+
+    # 2. Near duplicates among distinct texts: LSH buckets propose candidates, MinHash agreement confirms them
+    if threshold < 1.0 and len(distinct_positions) > 1:
+        signatures = {i: minhash_signature(normalized_texts[i]) for i in distinct_positions}
+        rows_per_band = MINHASH_PERMUTATIONS // LSH_BANDS
+        for band in range(LSH_BANDS):
+            buckets = {}
+            band_slice = slice(band * rows_per_band, (band + 1) * rows_per_band)
+            for i in distinct_positions:
+                buckets.setdefault(signatures[i][band_slice].tobytes(), []).append(i)
+            for bucket in buckets.values():
+                for position, i in enumerate(bucket):
+                    for j in bucket[position + 1:]:
+                        root_i, root_j = _find(parents, i), _find(parents, j)
+                        if root_i != root_j and np.mean(signatures[i] == signatures[j]) >= threshold:
+                            # Keep the earliest posting as representative
+                            parents[max(root_i, root_j)] = min(root_i, root_j)
+
+    return [_find(parents, i) for i in range(len(texts))]
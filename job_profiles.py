@@ -0,0 +1,180 @@
+import json
+import os
+import re
+import time
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+import job_analyzer
+import send_job_email
+
+# --- Profiles Mode ---
+# Score one scrape against many resumes. profiles.json is a list of objects:
+#   [{"name": "alice", "resume": "resumes/alice.pdf", "email": "alice@example.com",
+#     "notes": "The user has 5 years of experience and is focusing on ML roles."}]
+# "email" and "notes" are optional; "notes" defaults to job_analyzer.DEFAULT_CANDIDATE_NOTES.
+PROFILES_FILE = "profiles.json"
+
+def profile_slug(name):
+    return re.sub(r'[^\w\-]', '_', name.strip()).strip('_') or "profile"
+
+def load_profiles(profiles_file=PROFILES_FILE):
+    """Load and validate the profiles file. Returns an empty list on error."""
+    try:
+        with open(profiles_file, 'r') as f:
+            profiles = json.load(f)
+    except Exception as e:
+        print(f"Error: Could not load profiles file '{profiles_file}': {e}")
+        return []
+
+    valid_profiles = []
+    seen_names = set()
+    for profile in profiles:
+        name = str(profile.get('name', '')).strip()
+        if not name or not profile.get('resume'):
+            print(f"Skipping profile without a name or resume: {profile}")
+            continue
+        if name in seen_names:
+            print(f"Skipping duplicate profile name: {name}")
+            continue
+        seen_names.add(name)
+        valid_profiles.append({
+            'name': name,
+            'slug': profile_slug(name),
+            'resume': profile['resume'],
+            'email': profile.get('email'),
+            'notes': profile.get('notes') or job_analyzer.DEFAULT_CANDIDATE_NOTES,
+        })
+    print(f"Loaded {len(valid_profiles)} profiles from {profiles_file}")
+    return valid_profiles
+
+def profile_output_names(profile):
+    return (f"analyzed_google_jobs_{profile['slug']}.csv", f"shortlisted_google_jobs_{profile['slug']}.csv")
+
+def analyze_profiles(df_jobs, profiles, write_csv=True):
+    """Score every profile against one shared set of job embeddings.
+
+    Jobs are embedded once for all profiles and similarity is a single profiles x jobs matrix,
+    so LLM calls are only made for each profile's own pre-filtered shortlist.
+    Returns {profile name: shortlisted jobs DataFrame}.
+    """
+    job_analyzer.load_cache()
+    job_analyzer.load_embedding_cache()
+    job_analyzer.add_job_ids(df_jobs)
+
+    # 1. Resumes and their embeddings
+    active_profiles = []
+    resume_embeddings = []
+    for profile in profiles:
+        print(f"\n--- Profile: {profile['name']} ---")
+        resume_text = job_analyzer.load_resume_text(profile['resume'])
+        if not resume_text:
+            continue
+        resume_embedding = job_analyzer.get_text_embedding(resume_text, task_type="RETRIEVAL_QUERY", title="Candidate Resume")
+        if not resume_embedding:
+            # Without an embedding this profile would need the LLM on the whole corpus
+            print(f"Could not generate resume embedding for {profile['name']}. Skipping profile.")
+            continue
+        active_profiles.append({**profile, 'resume_text': resume_text})
+        resume_embeddings.append(np.asarray(resume_embedding, dtype=np.float32))
+
+    if not active_profiles:
+        print("No usable profiles.")
+        return {}
+
+    # 2. One embedding pass over the distinct jobs, one similarity matrix for all profiles
+    df_candidates = df_jobs
+    duplicates = {}
+    if job_analyzer.DEDUPLICATE_JOBS:
+        df_candidates, duplicates = job_analyzer.dedupe_jobs(df_jobs)
+
+    print("\n--- Starting Embedding Pre-filtering (shared by all profiles) ---")
+    original_indices, job_embeddings_matrix = job_analyzer.embed_jobs(df_candidates)
+    if not original_indices:
+        print("Could not generate embeddings for any jobs.")
+        return {}
+    similarity_matrix = cosine_similarity(np.stack(resume_embeddings), job_embeddings_matrix)
+    print(f"Computed {similarity_matrix.shape[0]}x{similarity_matrix.shape[1]} profile/job similarity matrix.")
+
+    # 3. Per-profile shortlist and LLM assessment
+    shortlists = {}
+    for i, profile in enumerate(active_profiles):
+        print(f"\n=== Analyzing jobs for profile: {profile['name']} ===")
+        jobs_to_process_further_df = job_analyzer.select_jobs_by_similarity(df_candidates, original_indices, similarity_matrix[i])
+        final_jobs_for_llm_df = job_analyzer.cap_jobs_for_llm(jobs_to_process_further_df)
+
+        jobs_for_llm_df, triage_assessments, triage_pending = final_jobs_for_llm_df, [], {}
+        if job_analyzer.TRIAGE_JOBS:
+            jobs_for_llm_df, triage_assessments, triage_pending = job_analyzer.triage_jobs(
+                final_jobs_for_llm_df, resume_embeddings[i], cache_scope=profile['name'])
+
+        all_llm_assessments = job_analyzer.assess_jobs_with_llm(
+            jobs_for_llm_df,
+            profile['resume_text'],
+            cache_scope=profile['name'],
+            candidate_notes=profile['notes'],
+        )
+        job_analyzer.record_triage_outcomes(all_llm_assessments, triage_pending, cache_scope=profile['name'])
+        all_llm_assessments = all_llm_assessments + triage_assessments
+        all_llm_assessments = job_analyzer.fan_out_assessments(all_llm_assessments, final_jobs_for_llm_df, df_jobs, duplicates)
+
+        output_csv_name, shortlisted_csv_name = profile_output_names(profile) if write_csv else (None, None)
+        _, df_shortlisted = job_analyzer.build_analysis_results(df_jobs, all_llm_assessments, output_csv_name, shortlisted_csv_name)
+        shortlists[profile['name']] = df_shortlisted
+
+    return shortlists
+
+def send_profile_emails(profiles, shortlists):
+    """Send each profile its own digest, all over one pooled SMTP session"""
+    sender_email = os.getenv('SENDER_EMAIL')
+    sender_password = os.getenv('SENDER_APP_PASSWORD')
+    if not sender_email or not sender_password:
+        print("❌ Email credentials not found in environment variables")
+        print("Required: SENDER_EMAIL, SENDER_APP_PASSWORD")
+        return False
+
+    messages = []
+    for profile in profiles:
+        if profile['name'] not in shortlists:
+            continue
+        if not profile.get('email'):
+            print(f"No email configured for profile {profile['name']}; skipping notification.")
+            continue
+        df_shortlisted = shortlists[profile['name']]
+        _, shortlisted_csv_name = profile_output_names(profile)
+        messages.append(send_job_email.build_digest_message(
+            sender_email,
+            profile['email'],
+            df_shortlisted,
+            attachment_payload=df_shortlisted.to_csv(index=False).encode('utf-8'),
+            attachment_name=shortlisted_csv_name,
+        ))
+
+    if not messages:
+        print("No profile emails to send.")
+        return True
+    return send_job_email.deliver_messages(messages, sender_email, sender_password)
+
+def main():
+    """Analyze the scraped CSV for every profile in PROFILES_FILE and email each one"""
+    job_analyzer.require_api_key()
+    start_time = time.time()
+    print("--- Starting Multi-Profile Job Fit Analysis ---")
+
+    profiles = load_profiles(PROFILES_FILE)
+    if not profiles:
+        return
+
+    df_jobs = job_analyzer.load_jobs_csv(job_analyzer.CSV_FILE_NAME)
+    if df_jobs is None:
+        return
+
+    shortlists = analyze_profiles(df_jobs, profiles)
+    send_profile_emails(profiles, shortlists)
+
+    total_time = time.time() - start_time
+    print(f"\n--- Multi-Profile Analysis Complete in {total_time:.2f} seconds ({total_time/60:.2f} minutes) ---")
+
+if __name__ == "__main__":
+    main()
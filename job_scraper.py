@@ -1,33 +1,327 @@
 import aiohttp
 from bs4 import BeautifulSoup
+from lxml import etree, html as lxml_html
 import csv
+import json
 import time
 import os
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
 import re
 import pandas as pd
 import asyncio
+import argparse
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
 # Number of concurrent requests
 CONCURRENCY_LIMIT = 10
 
-async def fetch_page(session, url, headers):
-    """Fetch a single page asynchronously"""
+# Listing pages requested ahead of the page being processed when the total count is unknown
+SPECULATIVE_PAGE_WINDOW = CONCURRENCY_LIMIT
+# Hard stop so a site that never returns an empty page cannot keep us paginating forever
+MAX_LISTING_PAGES = 500
+# Consecutive failed fetches past the known page range after which discovery gives up
+MAX_CONSECUTIVE_PAGE_FAILURES = 3
+
+# --- Listing Pre-filters ---
+# Evaluated on listing data (title, location, experience level) before any detail page is fetched,
+# so postings the analyzer would obviously reject never cost a detail request. Empty values disable a filter.
+LISTING_INCLUDE_TITLE_PATTERNS = []   # e.g. [r'engineer', r'analyst'] - keep only titles matching one of these
+LISTING_EXCLUDE_TITLE_PATTERNS = []   # e.g. [r'\bsenior staff\b', r'\bdirector\b']
+LISTING_ALLOWED_LEVELS = []           # e.g. ['Early', 'Mid'] - matched against experience_level
+LISTING_ALLOWED_LOCATIONS = []        # e.g. ['Bengaluru', 'Hyderabad'] - any one must appear in the location
+LISTING_MIN_KEYWORD_SCORE = 0.0       # 0-1 share of title keywords found in the resume (needs resume text)
+
+# --- Streaming Fetch ---
+# Careers pages carry a large script/style payload after the job list and detail sections. With streaming on,
+# the compressed response is decoded chunk by chunk into an incremental lxml parser and the connection is
+# closed as soon as the elements the extractors need are complete. Pages that never complete are read in full.
+STREAM_PAGES = True
+STREAM_CHUNK_SIZE = 16 * 1024
+DETAIL_SECTION_TITLES = ['Minimum qualifications:', 'Preferred qualifications:', 'About the job', 'Responsibilities']
+
+fetch_stats = {'pages': 0, 'bytes': 0, 'stopped_early': 0}
+
+# --- Embedded JSON Ingestion ---
+# Careers pages also ship their job data as JSON in AF_initDataCallback(...) script blocks. Decoding that payload
+# is much cheaper than a BeautifulSoup pass, and listing records already carry the qualification, about and
+# responsibility sections, so those jobs need no detail fetch. Pages without a usable payload use DOM extraction.
+EMBEDDED_JSON_INGESTION = True
+EMBEDDED_DATA_RE = re.compile(r"AF_initDataCallback\(\{key:\s*'ds:\d+'.*?data:(\[.*?\]), sideChannel:", re.DOTALL)
+# Positions in an embedded job record: [id, title, apply url, [_, responsibilities html], [_, qualifications html],
+# ..., [[location, ...], ...], [_, about html], ...]
+EMBEDDED_JOB_FIELDS = {'id': 0, 'title': 1, 'responsibilities': 3, 'qualifications': 4, 'locations': 9, 'about': 10}
+CAREERS_BASE_URL = 'https://www.google.com/about/careers/applications'
+
+TITLE_STOPWORDS = {'and', 'or', 'of', 'the', 'for', 'in', 'a', 'an', 'to', 'with', 'i', 'ii', 'iii', 'iv'}
+
+# URL for Google careers with filters
+GOOGLE_JOBS_URL = "https://www.google.com/about/careers/applications/jobs/results?location=India&target_level=INTERN_AND_APPRENTICE&target_level=EARLY&target_level=MID&employment_type=FULL_TIME"
+
+def _has_class(element, class_name):
+    return class_name in element.get('class', '').split()
+
+def listing_page_complete():
+    """Completion check for listing pages: the li.lLd3Je list, job count and next-page button have all closed.
+
+    With EMBEDDED_JSON_INGESTION the page is complete once the list and a script holding the job payload have
+    closed instead (the list supplies the experience levels the payload lacks), so pages without a payload are
+    read in full and extracted from the DOM.
+    """
+    state = {'list': None, 'list_done': False, 'count_done': False, 'next_done': False, 'payload_done': False}
+
+    def is_complete(event, element):
+        if event != 'end':
+            return False
+        if EMBEDDED_JSON_INGESTION and element.tag == 'script' and find_embedded_job_records(element.text or ''):
+            state['payload_done'] = True
+        elif element.tag == 'li' and _has_class(element, 'lLd3Je') and state['list'] is None:
+            state['list'] = element.getparent()
+        elif element is state['list']:
+            state['list_done'] = True
+        elif element.get('jsname') == 'uEp2ad':
+            state['count_done'] = True
+        elif element.get('jsname') == 'ViaHrd':
+            state['next_done'] = True
+        if EMBEDDED_JSON_INGESTION:
+            return state['payload_done'] and state['list_done']
+        return state['list_done'] and state['count_done'] and state['next_done']
+
+    return is_complete
+
+def detail_page_complete():
+    """Completion check for detail pages: all four sections (see extract_job_details) have closed"""
+    pending_sections = set(DETAIL_SECTION_TITLES)
+    state = {'section': None, 'content': None}
+
+    def is_complete(event, element):
+        section = state['section']
+        if event == 'start':
+            if element.tag == 'h3' and section == 'About the job':
+                # About the job runs until the next heading (extract_job_details looks for one after it)
+                pending_sections.discard(section)
+                state['section'] = None
+            elif element.tag == 'ul' and section and section != 'About the job' and state['content'] is None:
+                state['content'] = element
+            return False
+
+        if element.tag == 'h3':
+            heading = ''.join(element.itertext()).strip()
+            if heading in pending_sections:
+                state['section'], state['content'] = heading, None
+        elif element is state['content']:
+            pending_sections.discard(section)
+            state['section'], state['content'] = None, None
+        return not pending_sections
+
+    return is_complete
+
+async def fetch_page(session, url, headers, page_complete=None):
+    """Fetch a single page asynchronously.
+
+    page_complete is a factory for a completion check (listing_page_complete, detail_page_complete). With
+    STREAM_PAGES on, reading stops at the first chunk after which the check passes; the partial page is
+    returned and the extractors parse it as before.
+    """
     try:
         async with session.get(url, headers=headers, timeout=30) as response:
             if response.status != 200:
                 print(f"Error: Status {response.status} for {url}")
                 return None
-            return await response.text()
+            if not STREAM_PAGES or page_complete is None:
+                html = await response.text()
+                fetch_stats['pages'] += 1
+                fetch_stats['bytes'] += len(html)
+                return html
+
+            is_complete = page_complete()
+            parser = etree.HTMLPullParser(events=('start', 'end'))
+            chunks = []
+            complete = False
+            async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                chunks.append(chunk)
+                parser.feed(chunk)
+                for event, element in parser.read_events():
+                    if isinstance(element.tag, str) and is_complete(event, element):
+                        complete = True
+                        break
+                if complete:
+                    # Drop the rest of the body instead of downloading it
+                    response.close()
+                    fetch_stats['stopped_early'] += 1
+                    break
+
+            body = b''.join(chunks)
+            fetch_stats['pages'] += 1
+            fetch_stats['bytes'] += len(body)
+            return body.decode(response.charset or 'utf-8', errors='replace')
     except Exception as e:
         print(f"Error fetching {url}: {e}")
         return None
 
+def _is_embedded_html_field(value):
+    return value is None or (isinstance(value, list) and len(value) > 1 and (value[1] is None or isinstance(value[1], str)))
+
+def _is_embedded_job_record(record):
+    """Check every EMBEDDED_JOB_FIELDS position holds the expected type, not just id and title"""
+    if not (isinstance(record, list) and len(record) > max(EMBEDDED_JOB_FIELDS.values())):
+        return False
+    job_id = record[EMBEDDED_JOB_FIELDS['id']]
+    locations = record[EMBEDDED_JOB_FIELDS['locations']]
+    return (isinstance(job_id, str) and job_id.isdigit()
+            and isinstance(record[EMBEDDED_JOB_FIELDS['title']], str)
+            and all(_is_embedded_html_field(record[EMBEDDED_JOB_FIELDS[field]]) for field in ('responsibilities', 'qualifications', 'about'))
+            and (locations is None or (isinstance(locations, list) and all(isinstance(location, list) for location in locations))))
+
+def job_id_from_url(url):
+    """The numeric posting id in a jobs/results/<id>-<slug> URL, or None"""
+    match = re.search(r'jobs/results/(\d+)', url or '')
+    return match.group(1) if match else None
+
+def _find_job_record_list(node, depth=0):
+    """First nested list whose items are all job records"""
+    if not isinstance(node, list) or depth > 4:
+        return None
+    if node and all(_is_embedded_job_record(item) for item in node):
+        return node
+    for item in node:
+        records = _find_job_record_list(item, depth + 1)
+        if records:
+            return records
+    return None
+
+def find_embedded_job_records(html):
+    """Decode the AF_initDataCallback payloads in a page and return the first list of job records found"""
+    for match in EMBEDDED_DATA_RE.finditer(html):
+        try:
+            data = _json_loads(match.group(1))
+        except ValueError:
+            continue
+        records = _find_job_record_list(data)
+        if records:
+            return records
+    return []
+
+def _embedded_html(record, field):
+    value = record[EMBEDDED_JOB_FIELDS[field]]
+    if isinstance(value, list) and len(value) > 1 and isinstance(value[1], str):
+        return value[1]
+    return None
+
+def _parse_fragment(fragment_html):
+    return lxml_html.fragment_fromstring(fragment_html, create_parent='div')
+
+def _clean_text(element):
+    return ' '.join(element.text_content().split())
+
+def embedded_job_details(record):
+    """Detail fields (same keys as extract_job_details) from an embedded job record"""
+    details = {}
+    qualifications_html = _embedded_html(record, 'qualifications')
+    if qualifications_html:
+        section_keys = {'Minimum qualifications:': 'minimum_qualifications', 'Preferred qualifications:': 'preferred_qualifications'}
+        section_key = None
+        for element in _parse_fragment(qualifications_html).iter():
+            if element.tag == 'h3':
+                section_key = section_keys.get(_clean_text(element))
+            elif element.tag == 'li' and section_key:
+                details.setdefault(section_key, []).append(_clean_text(element))
+
+    about_html = _embedded_html(record, 'about')
+    if about_html:
+        about_root = _parse_fragment(about_html)
+        details['about_job'] = ' '.join(_clean_text(p) for p in about_root.iter('p')) or _clean_text(about_root)
+
+    responsibilities_html = _embedded_html(record, 'responsibilities')
+    if responsibilities_html:
+        details['responsibilities'] = [_clean_text(li) for li in _parse_fragment(responsibilities_html).iter('li')]
+
+    if details:
+        details['full_description'] = build_full_description(details)
+    return details
+
+def _has_class_xpath(class_name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+def dom_experience_levels(html):
+    """{job id: experience level} from the rendered list (the embedded records do not carry the level)"""
+    try:
+        root = lxml_html.fromstring(html)
+    except (etree.ParserError, ValueError):
+        return {}
+    levels = {}
+    for listing in root.xpath(f"//li[{_has_class_xpath('lLd3Je')}]"):
+        hrefs = listing.xpath(f".//a[{_has_class_xpath('WpHeLc')}]/@href")
+        level_elements = listing.xpath(f".//span[{_has_class_xpath('wVSTAb')}]")
+        job_id = job_id_from_url(hrefs[0]) if hrefs else None
+        if job_id and level_elements:
+            levels[job_id] = level_elements[0].text_content().strip()
+    return levels
+
+def embedded_job(record, base_url, page_num, experience_levels=None):
+    """Map an embedded job record to the listing job schema, with its detail fields when present.
+
+    experience_levels ({job id: level}, see dom_experience_levels) fills the one listing field the record lacks.
+    """
+    job_id = record[EMBEDDED_JOB_FIELDS['id']]
+    title = record[EMBEDDED_JOB_FIELDS['title']].strip()
+    locations = record[EMBEDDED_JOB_FIELDS['locations']]
+    location_names = [location[0] for location in locations or [] if isinstance(location, list) and location and isinstance(location[0], str)]
+
+    # Same shape as the listing links: jobs/results/<id>-<title slug>?<search query>
+    slug = re.sub(r'[^a-z0-9]+', '-', title.lower()).strip('-')
+    query = urlparse(base_url).query
+    job_data = {
+        'page': page_num,
+        'title': title or "Unknown",
+        'location': '; '.join(location_names) or "N/A",
+        'experience_level': (experience_levels or {}).get(str(job_id), "N/A"),
+        'url': urljoin(CAREERS_BASE_URL, f"jobs/results/{job_id}-{slug}" + (f"?{query}" if query else "")),
+    }
+    job_data.update(embedded_job_details(record))
+    return job_data
+
+def check_embedded_layout(html, base_url=GOOGLE_JOBS_URL):
+    """Cross-check EMBEDDED_JOB_FIELDS against the DOM listings of the same page.
+
+    Returns (ok, message). ok is None when the page has no DOM listings to compare against.
+    """
+    records = find_embedded_job_records(html)
+    if not records:
+        return False, "no embedded job payload found"
+    dom_jobs, _, _ = extract_jobs_from_dom(html, 1)
+    dom_titles = {job_id_from_url(job['url']): job['title'] for job in dom_jobs if job_id_from_url(job['url'])}
+    if not dom_titles:
+        return None, f"{len(records)} embedded records, but no DOM listings to cross-check them against"
+
+    embedded_jobs = [embedded_job(record, base_url, 1) for record in records]
+    embedded_titles = {job_id_from_url(job['url']): job['title'] for job in embedded_jobs}
+    matched = [job_id for job_id, title in dom_titles.items() if embedded_titles.get(job_id) == title]
+    with_sections = sum(1 for job in embedded_jobs if 'full_description' in job)
+    message = (f"{len(matched)}/{len(dom_titles)} DOM listings matched an embedded record by id and title; "
+               f"{with_sections}/{len(embedded_jobs)} embedded records carry detail sections")
+    return len(matched) >= 0.8 * len(dom_titles), message
+
 def extract_jobs_from_html(html, base_url, page_num):
     """Extract job listings from HTML content"""
     if not html:
         return [], None, 0
 
+    if EMBEDDED_JSON_INGESTION:
+        records = find_embedded_job_records(html)
+        if records:
+            # No next-page link or total count here; fetch_listing_pages discovers pages speculatively
+            experience_levels = dom_experience_levels(html)
+            return [embedded_job(record, base_url, page_num, experience_levels) for record in records], None, 0
+
+    return extract_jobs_from_dom(html, page_num)
+
+def extract_jobs_from_dom(html, page_num):
+    """Extract job listings from the rendered list (class-name selectors)"""
     soup = BeautifulSoup(html, 'html.parser')
     jobs = []
 
@@ -68,17 +362,30 @@ def extract_jobs_from_html(html, base_url, page_num):
     total_jobs = 0
     pagination_text = soup.select_one('div.VfPpkd-wZVHld-gruSEe-j4LONd div[jsname="uEp2ad"]')
     if pagination_text:
-        match = re.search(r'of\s+(\d+)', pagination_text.text)
-        if match:
-            total_jobs = int(match.group(1))
+        match = re.search(r'of\s+([\d,]+)', pagination_text.text)
+        if match and match.group(1).replace(',', ''):
+            total_jobs = int(match.group(1).replace(',', ''))
 
     return jobs, next_page_url, total_jobs
 
-def extract_job_details(html):
-    """Extract detailed job information from job detail page"""
+def extract_job_details(html, job_url=None):
+    """Extract detailed job information from job detail page.
+
+    Detail pages also embed the whole search-results list, so the embedded record is only used when its
+    id matches the job being fetched (job_url); otherwise the DOM sections are read.
+    """
     if not html:
         return {}
 
+    job_id = job_id_from_url(job_url)
+    if EMBEDDED_JSON_INGESTION and job_id:
+        for record in find_embedded_job_records(html):
+            if record[EMBEDDED_JOB_FIELDS['id']] == job_id:
+                details = embedded_job_details(record)
+                if details:
+                    return details
+                break
+
     soup = BeautifulSoup(html, 'html.parser')
     details = {}
 
@@ -122,7 +429,12 @@ def extract_job_details(html):
                 resp_list.append(li.text.strip())
         details['responsibilities'] = resp_list
 
-    # Create a full description that combines all sections
+    details['full_description'] = build_full_description(details)
+
+    return details
+
+def build_full_description(details):
+    """Combine the detail sections into one description"""
     full_description = ""
 
     if 'minimum_qualifications' in details:
@@ -146,19 +458,151 @@ def extract_job_details(html):
         for resp in details['responsibilities']:
             full_description += f"{resp}\n"
 
-    details['full_description'] = full_description
+    return full_description
 
-    return details
+def _keywords(text):
+    return {word for word in re.findall(r'[a-z0-9+#]+', text.lower()) if word not in TITLE_STOPWORDS and len(word) > 1}
+
+def build_listing_filter(include_title_patterns=None, exclude_title_patterns=None, allowed_levels=None,
+                         allowed_locations=None, resume_text=None, min_keyword_score=None):
+    """Build a listing pre-filter from the LISTING_* settings (or explicit overrides).
+
+    Returns a function job -> skip reason (None means the job should get a detail fetch),
+    or None when no filter is configured.
+    """
+    include_title_patterns = LISTING_INCLUDE_TITLE_PATTERNS if include_title_patterns is None else include_title_patterns
+    exclude_title_patterns = LISTING_EXCLUDE_TITLE_PATTERNS if exclude_title_patterns is None else exclude_title_patterns
+    allowed_levels = LISTING_ALLOWED_LEVELS if allowed_levels is None else allowed_levels
+    allowed_locations = LISTING_ALLOWED_LOCATIONS if allowed_locations is None else allowed_locations
+    min_keyword_score = LISTING_MIN_KEYWORD_SCORE if min_keyword_score is None else min_keyword_score
+
+    include_res = [re.compile(pattern, re.IGNORECASE) for pattern in include_title_patterns]
+    exclude_res = [re.compile(pattern, re.IGNORECASE) for pattern in exclude_title_patterns]
+    levels = {level.strip().lower() for level in allowed_levels}
+    locations = [location.strip().lower() for location in allowed_locations]
+    resume_keywords = _keywords(resume_text) if resume_text and min_keyword_score > 0 else None
 
-async def scrape_google_jobs(base_url):
-    """Scrape Google jobs with concurrent requests"""
+    if not (include_res or exclude_res or levels or locations or resume_keywords):
+        return None
+
+    def listing_filter(job):
+        title = job.get('title', '')
+        if include_res and not any(regex.search(title) for regex in include_res):
+            return 'title not included'
+        if any(regex.search(title) for regex in exclude_res):
+            return 'title excluded'
+        # Unknown levels are kept: the listing did not show one
+        job_level = job.get('experience_level', 'N/A').strip().lower()
+        if levels and job_level != 'n/a' and job_level not in levels:
+            return 'level'
+        if locations:
+            job_location = job.get('location', '').lower()
+            if not any(location in job_location for location in locations):
+                return 'location'
+        if resume_keywords:
+            title_keywords = _keywords(title)
+            if title_keywords and len(title_keywords & resume_keywords) / len(title_keywords) < min_keyword_score:
+                return 'keyword score'
+        return None
+
+    return listing_filter
+
+def apply_listing_filter(jobs, listing_filter):
+    """Split listing jobs into survivors and skip counts per reason"""
+    if listing_filter is None:
+        return jobs, {}
+    kept_jobs = []
+    skip_counts = {}
+    for job in jobs:
+        reason = listing_filter(job)
+        if reason is None:
+            kept_jobs.append(job)
+        else:
+            skip_counts[reason] = skip_counts.get(reason, 0) + 1
+    return kept_jobs, skip_counts
+
+async def fetch_listing_pages(session, base_url, headers, total_jobs, jobs_per_page, seen_urls, next_links_reliable):
+    """Fetch listing pages 2..N concurrently and return their jobs in page order.
+
+    When the total job count is known, every page it implies is requested at once. The count only sizes that
+    first batch and never ends discovery: past it (or when the count could not be parsed) pages are requested
+    speculatively, SPECULATIVE_PAGE_WINDOW ahead of the page being processed. Discovery stops at the first empty, short or already-seen page, or at a page without a
+    next-page link (if page 1 had one), and all requests still in flight are cancelled.
+    """
+    known_pages = (total_jobs + jobs_per_page - 1) // jobs_per_page if total_jobs else 0
+    if known_pages:
+        print(f"Estimated {known_pages} total pages to process")
+    else:
+        print("Total job count not found; discovering pages speculatively")
+
+    jobs = []
+    pending = {}
+    next_page_to_request = 2
+    page_num = 2
+    consecutive_failures = 0
+
+    try:
+        while page_num <= MAX_LISTING_PAGES:
+            # Request every known page at once; past the known range keep a speculative window in flight
+            if page_num <= known_pages:
+                last_page_to_request = known_pages
+            else:
+                last_page_to_request = min(page_num + SPECULATIVE_PAGE_WINDOW - 1, MAX_LISTING_PAGES)
+            while next_page_to_request <= last_page_to_request:
+                url = f"{base_url}&page={next_page_to_request}"
+                pending[next_page_to_request] = asyncio.create_task(fetch_page(session, url, headers, listing_page_complete))
+                next_page_to_request += 1
+
+            html = await pending.pop(page_num)
+            if not html:
+                consecutive_failures += 1
+                if page_num > known_pages and consecutive_failures >= MAX_CONSECUTIVE_PAGE_FAILURES:
+                    print(f"Stopping pagination after {consecutive_failures} failed pages")
+                    break
+                page_num += 1
+                continue
+            consecutive_failures = 0
+
+            page_jobs, next_page_url, _ = extract_jobs_from_html(html, base_url, page_num)
+            new_jobs = [job for job in page_jobs if job['url'] == 'N/A' or job['url'] not in seen_urls]
+            if not new_jobs:
+                print(f"Page {page_num} has no new jobs; stopping pagination")
+                break
+            seen_urls.update(job['url'] for job in new_jobs)
+            jobs.extend(new_jobs)
+            print(f"Processing page {page_num}: {len(new_jobs)} jobs extracted")
+
+            if page_num >= known_pages:
+                if len(page_jobs) < jobs_per_page:
+                    print(f"Page {page_num} is not full; it is the last page")
+                    break
+                if next_links_reliable and not next_page_url:
+                    print(f"Page {page_num} has no next-page link; it is the last page")
+                    break
+            page_num += 1
+    finally:
+        # Cancel speculative requests for pages past the end
+        for task in pending.values():
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending.values(), return_exceptions=True)
+
+    return jobs
+
+async def scrape_google_jobs(base_url, listing_filter=None):
+    """Scrape Google jobs with concurrent requests.
+
+    listing_filter (see build_listing_filter) drops postings before their detail page is fetched.
+    """
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
         'Accept-Language': 'en-US,en;q=0.9',
+        'Accept-Encoding': 'gzip, deflate',
         'Referer': 'https://www.google.com/',
     }
 
+    global EMBEDDED_JSON_INGESTION
     start_time = time.time()
     all_jobs = []
     total_jobs = 0
@@ -166,44 +610,49 @@ async def scrape_google_jobs(base_url):
     # Create a throttled client session
     conn = aiohttp.TCPConnector(limit=CONCURRENCY_LIMIT)
     async with aiohttp.ClientSession(connector=conn) as session:
-        # First, get the total number of jobs and listing pages
-        first_page_html = await fetch_page(session, base_url, headers)
+        # First, get the total number of jobs and listing pages. With embedded JSON on, page 1 is read in full
+        # so the record layout can be checked against its DOM listings before the payload is trusted.
+        first_page_html = await fetch_page(session, base_url, headers, None if EMBEDDED_JSON_INGESTION else listing_page_complete)
+        if first_page_html and EMBEDDED_JSON_INGESTION:
+            layout_ok, layout_message = check_embedded_layout(first_page_html, base_url)
+            print(f"Embedded JSON layout check: {layout_message}")
+            if layout_ok is False:
+                print("Embedded JSON does not match the page; using DOM extraction for this run")
+                EMBEDDED_JSON_INGESTION = False
         if first_page_html:
             first_page_jobs, next_url, total_jobs = extract_jobs_from_html(first_page_html, base_url, 1)
             all_jobs.extend(first_page_jobs)
             print(f"Found {total_jobs} total jobs. Processing page 1: {len(first_page_jobs)} jobs extracted")
 
-            # Calculate total pages (20 jobs per page)
-            estimated_pages = (total_jobs + 19) // 20
-            print(f"Estimated {estimated_pages} total pages to process")
-
-            # Create URLs for all pages (2 to estimated_pages)
-            urls = [f"{base_url}&page={i}" for i in range(2, estimated_pages + 1)]
+            # Discover the remaining listing pages in parallel
+            jobs_per_page = len(first_page_jobs) or 20
+            all_jobs.extend(await fetch_listing_pages(
+                session, base_url, headers, total_jobs, jobs_per_page,
+                seen_urls={job['url'] for job in first_page_jobs},
+                next_links_reliable=next_url is not None,
+            ))
+            unknown_levels = sum(1 for job in all_jobs if job.get('experience_level', 'N/A') == 'N/A')
+            if LISTING_ALLOWED_LEVELS and unknown_levels:
+                print(f"Warning: {unknown_levels} jobs have no experience level; LISTING_ALLOWED_LEVELS keeps them")
+            if total_jobs and len(all_jobs) != total_jobs:
+                print(f"Warning: page count said {total_jobs} jobs but {len(all_jobs)} were extracted")
+
+            # Push listing-level filters down so only survivors get a detail fetch
+            all_jobs, skip_counts = apply_listing_filter(all_jobs, listing_filter)
+            if skip_counts:
+                skipped = sum(skip_counts.values())
+                reasons = ", ".join(f"{reason}: {count}" for reason, count in sorted(skip_counts.items()))
+                print(f"Listing pre-filters skipped {skipped} jobs ({reasons}); {len(all_jobs)} left for detail fetch")
 
-            # Process remaining pages in batches
             batch_size = CONCURRENCY_LIMIT
-            for i in range(0, len(urls), batch_size):
-                batch_urls = urls[i:i+batch_size]
-
-                # Create tasks for batch
-                tasks = [fetch_page(session, url, headers) for url in batch_urls]
-
-                # Wait for all tasks to complete
-                pages_html = await asyncio.gather(*tasks)
-
-                # Process each page
-                for j, html in enumerate(pages_html):
-                    page_num = i + j + 2  # +2 because we start from page 2
-                    if html:
-                        jobs, _, _ = extract_jobs_from_html(html, base_url, page_num)
-                        all_jobs.extend(jobs)
-                        print(f"Processing page {page_num}: {len(jobs)} jobs extracted")
 
             # Now fetch job details for each job
             print("\nFetching detailed job descriptions...")
 
-            # Get all job URLs
-            job_urls = [job['url'] for job in all_jobs if job['url'] != 'N/A']
+            # Get all job URLs; jobs ingested with their sections from embedded JSON need no detail page
+            job_urls = [job['url'] for job in all_jobs if job['url'] != 'N/A' and 'full_description' not in job]
+            if len(job_urls) < len(all_jobs):
+                print(f"{len(all_jobs) - len(job_urls)} jobs already have details (embedded JSON or no URL)")
             total_details = len(job_urls)
 
             # Process job details in batches
@@ -212,7 +661,7 @@ async def scrape_google_jobs(base_url):
                 print(f"Fetching details for jobs {i+1}-{min(i+batch_size, total_details)} of {total_details}")
 
                 # Create tasks for batch
-                tasks = [fetch_page(session, url, headers) for url in batch_urls]
+                tasks = [fetch_page(session, url, headers, detail_page_complete) for url in batch_urls]
 
                 # Wait for all tasks to complete
                 details_html = await asyncio.gather(*tasks)
@@ -222,7 +671,7 @@ async def scrape_google_jobs(base_url):
                     url_index = i + j
                     if url_index < len(all_jobs) and html:
                         # Extract details
-                        details = extract_job_details(html)
+                        details = extract_job_details(html, job_urls[url_index])
 
                         # Find the corresponding job in all_jobs
                         for k, job in enumerate(all_jobs):
@@ -235,6 +684,8 @@ async def scrape_google_jobs(base_url):
                 await asyncio.sleep(1)
 
     end_time = time.time()
+    print(f"Read {fetch_stats['bytes'] / 1e6:.1f} MB (decompressed) over {fetch_stats['pages']} pages; "
+          f"{fetch_stats['stopped_early']} pages were closed as soon as their content was complete")
     print(f"Extraction completed in {end_time - start_time:.2f} seconds")
     return all_jobs
 
@@ -296,14 +747,13 @@ def save_to_csv(jobs, filename='google_jobs_with_details.csv'):
 
 async def main():
     """Main async function"""
-    # URL for Google careers with filters
-    base_url = "https://www.google.com/about/careers/applications/jobs/results?location=India&target_level=INTERN_AND_APPRENTICE&target_level=EARLY&target_level=MID&employment_type=FULL_TIME"
+    base_url = GOOGLE_JOBS_URL
 
     print("Starting Google Jobs Scraper with Full Descriptions")
     print("This will first extract all job listings, then visit each job page to get complete descriptions")
 
     # Extract job listings with details
-    all_jobs = await scrape_google_jobs(base_url)
+    all_jobs = await scrape_google_jobs(base_url, build_listing_filter())
 
     # Save results
     if all_jobs:
@@ -335,5 +785,17 @@ async def main():
         print("No jobs were extracted")
         return pd.DataFrame()
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape Google careers listings and job details")
+    parser.add_argument('--check-embedded', metavar='HTML_FILE',
+                        help="Check EMBEDDED_JOB_FIELDS against a saved listing page and exit")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    df_jobs = asyncio.run(main())
+    args = parse_args()
+    if args.check_embedded:
+        with open(args.check_embedded, 'r', encoding='utf-8') as f:
+            layout_ok, layout_message = check_embedded_layout(f.read())
+        print(f"{'OK' if layout_ok else 'Not verified' if layout_ok is None else 'MISMATCH'}: {layout_message}")
+    else:
+        df_jobs = asyncio.run(main())
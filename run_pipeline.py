@@ -0,0 +1,113 @@
+import argparse
+import asyncio
+import time
+
+import pandas as pd
+
+import job_scraper
+import job_analyzer
+import job_profiles
+import send_job_email
+
+# Stages that can write their output to disk. Disk files are only checkpoints here:
+# every stage hands its result to the next one in memory.
+CHECKPOINT_STAGES = ["scrape", "analyze"]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run scrape -> analyze -> notify in a single process")
+    parser.add_argument('--checkpoint', action='append', choices=CHECKPOINT_STAGES + ['all'], default=[],
+                        help="Write the CSV output of a stage to disk (can be repeated, or 'all')")
+    parser.add_argument('--skip-email', action='store_true', help="Stop after the analysis stage")
+    parser.add_argument('--url', default=job_scraper.GOOGLE_JOBS_URL, help="Google careers search URL to scrape")
+    parser.add_argument('--resume', default=job_analyzer.PDF_RESUME_FILE_NAME, help="Path to the resume PDF")
+    parser.add_argument('--profiles', help="Profiles JSON file: score one scrape against several resumes")
+    return parser.parse_args()
+
+def scrape_jobs_dataframe(base_url, checkpoints, resume_text=None):
+    """Run the scraper and return its jobs as a DataFrame (None if nothing was scraped).
+
+    resume_text enables the listing keyword pre-filter (LISTING_MIN_KEYWORD_SCORE).
+    """
+    print("\n=== Stage 1/3: Scraping jobs ===")
+    listing_filter = job_scraper.build_listing_filter(resume_text=resume_text)
+    all_jobs = asyncio.run(job_scraper.scrape_google_jobs(base_url, listing_filter))
+    if not all_jobs:
+        print("No jobs were extracted")
+        return None
+    if 'scrape' in checkpoints:
+        job_scraper.save_to_csv(all_jobs, job_analyzer.CSV_FILE_NAME)
+
+    # Job records keep their list-valued fields (qualifications, responsibilities) as native lists
+    df_jobs = pd.DataFrame(all_jobs)
+    print(f"Handing {len(df_jobs)} jobs to the analyzer")
+    return df_jobs
+
+def run_pipeline(base_url=job_scraper.GOOGLE_JOBS_URL, resume_file=job_analyzer.PDF_RESUME_FILE_NAME,
+                 checkpoints=(), send_email=True):
+    """Scrape, analyze and notify in one process. Returns the shortlisted jobs DataFrame."""
+    start_time = time.time()
+    checkpoints = set(CHECKPOINT_STAGES) if 'all' in checkpoints else set(checkpoints)
+
+    # Fail fast before scraping if there is nothing to score against
+    resume_text = job_analyzer.load_resume_text(resume_file)
+    if not resume_text:
+        return None
+
+    # 1. Scrape
+    df_jobs = scrape_jobs_dataframe(base_url, checkpoints, resume_text)
+    if df_jobs is None:
+        return None
+
+    # 2. Analyze
+    print("\n=== Stage 2/3: Analyzing jobs ===")
+    analyze_checkpoint = 'analyze' in checkpoints
+    _, df_shortlisted = job_analyzer.analyze_jobs(
+        df_jobs,
+        resume_text,
+        output_csv_name=job_analyzer.OUTPUT_CSV_NAME if analyze_checkpoint else None,
+        shortlisted_csv_name=job_analyzer.SHORTLISTED_CSV_NAME if analyze_checkpoint else None,
+    )
+
+    # 3. Notify
+    if send_email:
+        print("\n=== Stage 3/3: Sending notification ===")
+        send_job_email.send_job_email(df_shortlisted, job_analyzer.SHORTLISTED_CSV_NAME)
+
+    total_time = time.time() - start_time
+    print(f"\n--- Pipeline Complete in {total_time:.2f} seconds ({total_time/60:.2f} minutes) ---")
+    return df_shortlisted
+
+def run_profiles_pipeline(profiles_file, base_url=job_scraper.GOOGLE_JOBS_URL, checkpoints=(), send_email=True):
+    """Scrape once, then analyze and notify every profile. Returns {profile name: shortlist}."""
+    start_time = time.time()
+    checkpoints = set(CHECKPOINT_STAGES) if 'all' in checkpoints else set(checkpoints)
+
+    profiles = job_profiles.load_profiles(profiles_file)
+    if not profiles:
+        return None
+
+    df_jobs = scrape_jobs_dataframe(base_url, checkpoints)
+    if df_jobs is None:
+        return None
+
+    print(f"\n=== Stage 2/3: Analyzing jobs for {len(profiles)} profiles ===")
+    shortlists = job_profiles.analyze_profiles(df_jobs, profiles, write_csv='analyze' in checkpoints)
+
+    if send_email:
+        print("\n=== Stage 3/3: Sending notifications ===")
+        job_profiles.send_profile_emails(profiles, shortlists)
+
+    total_time = time.time() - start_time
+    print(f"\n--- Pipeline Complete in {total_time:.2f} seconds ({total_time/60:.2f} minutes) ---")
+    return shortlists
+
+def main():
+    args = parse_args()
+    job_analyzer.require_api_key()
+    if args.profiles:
+        run_profiles_pipeline(args.profiles, args.url, args.checkpoint, send_email=not args.skip_email)
+    else:
+        run_pipeline(args.url, args.resume, args.checkpoint, send_email=not args.skip_email)
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
-import smtplib
 import pandas as pd
 import os
+import html
+import numbers
+from string import Template
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
@@ -8,116 +10,77 @@ from email import encoders
 from datetime import datetime
 import json
 
-def create_email_body(df_shortlisted):
-    """Create a beautiful HTML email body with job listings"""
-    
-    if df_shortlisted.empty:
-        return """
+from email_delivery import SMTPConnectionPool, send_messages
+
+# --- Email Templates ---
+# Compiled once at import. Row styling lives in the <style> block as classes instead of being
+# repeated inline on every row, so a row is a single substitute() over precomputed fields.
+EMPTY_BODY_TEMPLATE = Template("""
         <html>
         <body style="font-family: Arial, sans-serif; margin: 20px;">
             <h2 style="color: #2c3e50;">🔍 Weekly Job Analysis Report</h2>
             <p>No jobs met your criteria this week. The system will keep looking for you!</p>
-            <p style="color: #7f8c8d; font-size: 12px;">Generated on {date}</p>
+            <p style="color: #7f8c8d; font-size: 12px;">Generated on $date</p>
         </body>
         </html>
-        """.format(date=datetime.now().strftime("%B %d, %Y at %I:%M %p"))
-    
-    # Sort by fit score descending
-    df_sorted = df_shortlisted.sort_values('fit_score', ascending=False)
-    
-    # Create HTML table
-    table_rows = ""
-    for _, job in df_sorted.iterrows():
-        # Handle potential missing data
-        title = job.get('job_title', 'N/A')
-        score = job.get('fit_score', 'N/A')
-        category = job.get('fit_category', 'N/A')
-        url = job.get('job_url', '#')
-        location = job.get('location', 'N/A')
-        experience_level = job.get('experience_level', 'N/A')
-        key_matches = job.get('key_matches', [])
-        outreach_snippet = job.get('auto_drafted_outreach_snippet', 'N/A')
-        
-        # Format key matches
-        if isinstance(key_matches, list):
-            matches_text = ', '.join(key_matches[:3])  # Show first 3 matches
-            if len(key_matches) > 3:
-                matches_text += f" (+{len(key_matches)-3} more)"
-        else:
-            matches_text = str(key_matches) if key_matches else 'N/A'
-        
-        # Color code based on score
-        if isinstance(score, (int, float)):
-            if score >= 9:
-                score_color = "#27ae60"  # Green
-            elif score >= 8:
-                score_color = "#f39c12"  # Orange
-            else:
-                score_color = "#3498db"  # Blue
-        else:
-            score_color = "#95a5a6"  # Gray
-        
-        table_rows += f"""
-        <tr style="border-bottom: 1px solid #ecf0f1;">
-            <td style="padding: 15px; vertical-align: top;">
-                <div style="font-weight: bold; font-size: 16px; color: #2c3e50; margin-bottom: 5px;">
-                    <a href="{url}" style="color: #3498db; text-decoration: none;" target="_blank">
-                        {title}
-                    </a>
-                </div>
-                <div style="color: #7f8c8d; font-size: 14px; margin-bottom: 5px;">
-                    📍 {location} | 👔 {experience_level}
-                </div>
-                <div style="color: #2c3e50; font-size: 13px; margin-bottom: 8px;">
-                    <strong>Key Matches:</strong> {matches_text}
-                </div>
-                <div style="background: #f8f9fa; padding: 8px; border-radius: 4px; font-size: 12px; color: #2c3e50; font-style: italic;">
-                    💬 {outreach_snippet[:150]}{'...' if len(str(outreach_snippet)) > 150 else ''}
-                </div>
+        """)
+
+ROW_TEMPLATE = Template("""
+        <tr class="job-row">
+            <td class="cell">
+                <div class="job-title"><a href="$url" target="_blank">$title</a></div>
+                <div class="job-meta">📍 $location | 👔 $experience_level</div>
+                <div class="job-matches"><strong>Key Matches:</strong> $matches_text</div>
+                <div class="job-snippet">💬 $outreach_snippet</div>
             </td>
-            <td style="padding: 15px; text-align: center; vertical-align: top;">
-                <div style="background: {score_color}; color: white; padding: 8px 12px; border-radius: 20px; font-weight: bold; font-size: 14px; margin-bottom: 5px;">
-                    {score}/10
-                </div>
-                <div style="font-size: 12px; color: #7f8c8d;">
-                    {category}
-                </div>
+            <td class="cell centered">
+                <div class="score-badge" style="background: $score_color;">$score/10</div>
+                <div class="score-category">$category</div>
             </td>
-            <td style="padding: 15px; text-align: center; vertical-align: top;">
-                <a href="{url}" target="_blank" style="background: #3498db; color: white; padding: 8px 16px; text-decoration: none; border-radius: 4px; font-size: 14px; font-weight: bold;">
-                    Apply Now
-                </a>
+            <td class="cell centered">
+                <a class="apply-button" href="$url" target="_blank">Apply Now</a>
             </td>
         </tr>
-        """
-    
-    html_body = f"""
+        """)
+
+BODY_TEMPLATE = Template("""
     <html>
     <head>
         <style>
-            body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; margin: 0; padding: 20px; background-color: #f8f9fa; }}
-            .container {{ max-width: 1000px; margin: 0 auto; background: white; border-radius: 8px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }}
-            .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; border-radius: 8px 8px 0 0; }}
-            .content {{ padding: 20px; }}
-            .stats {{ background: #ecf0f1; padding: 15px; border-radius: 6px; margin: 15px 0; }}
-            .job-table {{ width: 100%; border-collapse: collapse; margin: 20px 0; }}
-            .footer {{ background: #34495e; color: white; padding: 15px; border-radius: 0 0 8px 8px; text-align: center; font-size: 12px; }}
+            body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; margin: 0; padding: 20px; background-color: #f8f9fa; }
+            .container { max-width: 1000px; margin: 0 auto; background: white; border-radius: 8px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }
+            .header { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; border-radius: 8px 8px 0 0; }
+            .content { padding: 20px; }
+            .stats { background: #ecf0f1; padding: 15px; border-radius: 6px; margin: 15px 0; }
+            .job-table { width: 100%; border-collapse: collapse; margin: 20px 0; }
+            .footer { background: #34495e; color: white; padding: 15px; border-radius: 0 0 8px 8px; text-align: center; font-size: 12px; }
+            .job-row { border-bottom: 1px solid #ecf0f1; }
+            .cell { padding: 15px; vertical-align: top; }
+            .centered { text-align: center; }
+            .job-title { font-weight: bold; font-size: 16px; color: #2c3e50; margin-bottom: 5px; }
+            .job-title a { color: #3498db; text-decoration: none; }
+            .job-meta { color: #7f8c8d; font-size: 14px; margin-bottom: 5px; }
+            .job-matches { color: #2c3e50; font-size: 13px; margin-bottom: 8px; }
+            .job-snippet { background: #f8f9fa; padding: 8px; border-radius: 4px; font-size: 12px; color: #2c3e50; font-style: italic; }
+            .score-badge { color: white; padding: 8px 12px; border-radius: 20px; font-weight: bold; font-size: 14px; margin-bottom: 5px; }
+            .score-category { font-size: 12px; color: #7f8c8d; }
+            .apply-button { background: #3498db; color: white; padding: 8px 16px; text-decoration: none; border-radius: 4px; font-size: 14px; font-weight: bold; }
         </style>
     </head>
     <body>
         <div class="container">
             <div class="header">
                 <h1 style="margin: 0; font-size: 24px;">🎯 Your Weekly Job Matches</h1>
-                <p style="margin: 5px 0 0 0; opacity: 0.9;">Generated on {datetime.now().strftime("%B %d, %Y at %I:%M %p")}</p>
+                <p style="margin: 5px 0 0 0; opacity: 0.9;">Generated on $generated_on</p>
             </div>
             
             <div class="content">
                 <div class="stats">
                     <h3 style="margin: 0 0 10px 0; color: #2c3e50;">📊 This Week's Summary</h3>
                     <div style="display: flex; gap: 20px; flex-wrap: wrap;">
-                        <div><strong>{len(df_sorted)}</strong> jobs matched your criteria</div>
-                        <div><strong>{len(df_sorted[df_sorted['fit_score'] >= 9])}</strong> excellent matches (9+ score)</div>
-                        <div><strong>{len(df_sorted[df_sorted['fit_score'] >= 8])}</strong> great matches (8+ score)</div>
+                        <div><strong>$total_count</strong> jobs matched your criteria</div>
+                        <div><strong>$excellent_count</strong> excellent matches (9+ score)</div>
+                        <div><strong>$great_count</strong> great matches (8+ score)</div>
                     </div>
                 </div>
                 
@@ -132,7 +95,7 @@ def create_email_body(df_shortlisted):
                         </tr>
                     </thead>
                     <tbody>
-                        {table_rows}
+                        $table_rows
                     </tbody>
                 </table>
                 
@@ -149,80 +112,181 @@ def create_email_body(df_shortlisted):
             
             <div class="footer">
                 <p style="margin: 0;">🤖 Automated by your GitHub Actions job analysis system</p>
-                <p style="margin: 5px 0 0 0; opacity: 0.8;">Next analysis: {(datetime.now().replace(hour=9, minute=0, second=0, microsecond=0) + pd.Timedelta(days=7)).strftime("%B %d, %Y")}</p>
+                <p style="margin: 5px 0 0 0; opacity: 0.8;">Next analysis: $next_analysis</p>
             </div>
         </div>
     </body>
     </html>
-    """
+    """)
+
+def _format_key_matches(key_matches):
+    if isinstance(key_matches, list):
+        matches_text = ', '.join(key_matches[:3])  # Show first 3 matches
+        if len(key_matches) > 3:
+            matches_text += f" (+{len(key_matches)-3} more)"
+        return matches_text
+    return str(key_matches) if isinstance(key_matches, str) and key_matches else 'N/A'
+
+def _score_color(score):
+    # Color code based on score
+    if isinstance(score, numbers.Number):
+        if score >= 9:
+            return "#27ae60"  # Green
+        if score >= 8:
+            return "#f39c12"  # Orange
+        return "#3498db"  # Blue
+    return "#95a5a6"  # Gray
+
+def _row_fields(job):
+    """Precompute the escaped template fields for one job record"""
+    outreach_snippet = str(job.get('auto_drafted_outreach_snippet', 'N/A'))
+    if len(outreach_snippet) > 150:
+        outreach_snippet = outreach_snippet[:150] + '...'
+    score = job.get('fit_score', 'N/A')
+    return {
+        'title': html.escape(str(job.get('job_title', 'N/A'))),
+        'url': html.escape(str(job.get('job_url', '#')), quote=True),
+        'location': html.escape(str(job.get('location', 'N/A'))),
+        'experience_level': html.escape(str(job.get('experience_level', 'N/A'))),
+        'matches_text': html.escape(_format_key_matches(job.get('key_matches', []))),
+        'outreach_snippet': html.escape(outreach_snippet),
+        'score': html.escape(str(score)),
+        'score_color': _score_color(score),
+        'category': html.escape(str(job.get('fit_category', 'N/A'))),
+    }
+
+def create_email_body(df_shortlisted):
+    """Create a beautiful HTML email body with job listings"""
+    
+    if df_shortlisted.empty:
+        return EMPTY_BODY_TEMPLATE.substitute(date=datetime.now().strftime("%B %d, %Y at %I:%M %p"))
+    
+    # Sort by fit score descending
+    df_sorted = df_shortlisted.sort_values('fit_score', ascending=False)
+    
+    # Render all rows in one pass over plain records
+    table_rows = "".join(ROW_TEMPLATE.substitute(_row_fields(job)) for job in df_sorted.to_dict('records'))
     
-    return html_body
+    fit_scores = pd.to_numeric(df_sorted['fit_score'], errors='coerce')
+    return BODY_TEMPLATE.substitute(
+        generated_on=datetime.now().strftime("%B %d, %Y at %I:%M %p"),
+        total_count=len(df_sorted),
+        excellent_count=int((fit_scores >= 9).sum()),
+        great_count=int((fit_scores >= 8).sum()),
+        table_rows=table_rows,
+        next_analysis=(datetime.now().replace(hour=9, minute=0, second=0, microsecond=0) + pd.Timedelta(days=7)).strftime("%B %d, %Y"),
+    )
 
-def send_job_email():
-    """Send email with shortlisted jobs"""
+def parse_recipients(recipient_value):
+    """Split a comma/semicolon separated recipient list"""
+    if not recipient_value:
+        return []
+    return [r.strip() for r in recipient_value.replace(';', ',').split(',') if r.strip()]
+
+def build_digest_message(sender_email, recipient_email, df_shortlisted, html_body=None,
+                         attachment_payload=None, attachment_name="shortlisted_google_jobs_full.csv"):
+    """Build one digest message. html_body can be rendered once and shared by many recipients."""
+    msg = MIMEMultipart('alternative')
+    msg['From'] = sender_email
+    msg['To'] = recipient_email
+    msg['Subject'] = f"🎯 {len(df_shortlisted)} New Job Matches - Week of {datetime.now().strftime('%b %d, %Y')}"
+    
+    if html_body is None:
+        html_body = create_email_body(df_shortlisted)
+    msg.attach(MIMEText(html_body, 'html'))
+    
+    if attachment_payload is not None:
+        part = MIMEBase('application', 'octet-stream')
+        part.set_payload(attachment_payload)
+        encoders.encode_base64(part)
+        part.add_header(
+            'Content-Disposition',
+            f'attachment; filename= {attachment_name}'
+        )
+        msg.attach(part)
+    return msg
+
+def deliver_messages(messages, sender_email, sender_password, pool=None):
+    """Send messages over one pooled, authenticated SMTP session. Returns True if all were delivered."""
+    print(f"📤 Sending {len(messages)} email(s)...")
+    owns_pool = pool is None
+    if owns_pool:
+        pool = SMTPConnectionPool(sender_email, sender_password)
+    try:
+        results = send_messages(messages, pool)
+    finally:
+        if owns_pool:
+            pool.close()
+    
+    all_sent = True
+    for msg, error in results:
+        if error is None:
+            print(f"✅ Email sent successfully to {msg['To']}")
+            print(f"📋 Subject: {msg['Subject']}")
+        else:
+            all_sent = False
+            print(f"❌ Failed to send email to {msg['To']}: {error}")
+    return all_sent
+
+def send_job_email(df_shortlisted=None, shortlisted_file="shortlisted_google_jobs_full.csv"):
+    """Send email with shortlisted jobs.
+
+    If df_shortlisted is given (in-memory handoff from the pipeline) it is used directly and the
+    CSV attachment is rendered from it; otherwise the shortlist is loaded from shortlisted_file.
+    RECIPIENT_EMAIL may list several addresses; each gets its own copy over a shared SMTP session.
+    """
     
     # Email configuration from environment variables
     sender_email = os.getenv('SENDER_EMAIL')
     sender_password = os.getenv('SENDER_APP_PASSWORD')  # Gmail App Password
-    recipient_email = os.getenv('RECIPIENT_EMAIL', sender_email)  # Default to sender if not specified
+    # Default to sender if not specified; an unset Actions secret arrives as an empty string
+    recipients = parse_recipients(os.getenv('RECIPIENT_EMAIL') or sender_email)
     
     if not sender_email or not sender_password:
         print("❌ Email credentials not found in environment variables")
         print("Required: SENDER_EMAIL, SENDER_APP_PASSWORD")
         return False
     
-    # Check if shortlisted file exists
-    shortlisted_file = "shortlisted_google_jobs_full.csv"
-    if not os.path.exists(shortlisted_file):
-        print(f"❌ Shortlisted jobs file not found: {shortlisted_file}")
+    if not recipients:
+        print("❌ No valid recipient addresses in RECIPIENT_EMAIL")
         return False
     
-    # Load shortlisted jobs
-    try:
-        df_shortlisted = pd.read_csv(shortlisted_file)
-        print(f"📊 Found {len(df_shortlisted)} shortlisted jobs")
-    except Exception as e:
-        print(f"❌ Error reading shortlisted jobs file: {e}")
-        return False
+    attachment_payload = None
+    if df_shortlisted is None:
+        # Check if shortlisted file exists
+        if not os.path.exists(shortlisted_file):
+            print(f"❌ Shortlisted jobs file not found: {shortlisted_file}")
+            return False
+        
+        # Load shortlisted jobs
+        try:
+            df_shortlisted = pd.read_csv(shortlisted_file)
+        except Exception as e:
+            print(f"❌ Error reading shortlisted jobs file: {e}")
+            return False
+    else:
+        attachment_payload = df_shortlisted.to_csv(index=False).encode('utf-8')
+    print(f"📊 Found {len(df_shortlisted)} shortlisted jobs")
     
-    # Create email
-    msg = MIMEMultipart('alternative')
-    msg['From'] = sender_email
-    msg['To'] = recipient_email
-    msg['Subject'] = f"🎯 {len(df_shortlisted)} New Job Matches - Week of {datetime.now().strftime('%b %d, %Y')}"
+    # Attach CSV file
+    if attachment_payload is None:
+        try:
+            with open(shortlisted_file, "rb") as attachment:
+                attachment_payload = attachment.read()
+            print("✅ CSV file attached successfully")
+        except Exception as e:
+            print(f"⚠️ Warning: Could not attach CSV file: {e}")
     
-    # Create HTML body
+    # Render the body once and share it across all recipients
     html_body = create_email_body(df_shortlisted)
-    html_part = MIMEText(html_body, 'html')
-    msg.attach(html_part)
-    
-    # Attach CSV file
-    try:
-        with open(shortlisted_file, "rb") as attachment:
-            part = MIMEBase('application', 'octet-stream')
-            part.set_payload(attachment.read())
-            encoders.encode_base64(part)
-            part.add_header(
-                'Content-Disposition',
-                f'attachment; filename= {shortlisted_file}'
-            )
-            msg.attach(part)
-        print("✅ CSV file attached successfully")
-    except Exception as e:
-        print(f"⚠️ Warning: Could not attach CSV file: {e}")
+    messages = [
+        build_digest_message(sender_email, recipient, df_shortlisted, html_body,
+                             attachment_payload, os.path.basename(shortlisted_file))
+        for recipient in recipients
+    ]
     
-    # Send email using Gmail SMTP
     try:
-        print("📤 Sending email...")
-        with smtplib.SMTP('smtp.gmail.com', 587) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.send_message(msg)
-        
-        print(f"✅ Email sent successfully to {recipient_email}")
-        print(f"📋 Subject: {msg['Subject']}")
-        return True
-        
+        return deliver_messages(messages, sender_email, sender_password)
     except Exception as e:
         print(f"❌ Failed to send email: {e}")
         return False